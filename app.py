@@ -7,7 +7,6 @@ import base64
 import numpy as np
 import seaborn as sns
 import matplotlib.pyplot as plt
-from sklearn.base import BaseEstimator, TransformerMixin
 
 # ----------------- Page Setup -----------------
 st.set_page_config(
@@ -52,66 +51,26 @@ st.markdown(
 )
 
 # ----------------- Pipeline Helper Classes -----------------
-class MissingValueHandler(BaseEstimator, TransformerMixin):
-    def __init__(self, numeric_cols, categorical_cols):
-        self.numeric_cols = numeric_cols
-        self.categorical_cols = categorical_cols
-
-    def fit(self, X, y=None):
-        self.num_median = X[self.numeric_cols].median()
-        self.cat_mode = X[self.categorical_cols].mode().iloc[0]
-        return self
-
-    def transform(self, X):
-        X = X.copy()
-        X[self.numeric_cols] = X[self.numeric_cols].fillna(self.num_median)
-        X[self.categorical_cols] = X[self.categorical_cols].fillna(self.cat_mode)
-        return X
-
-class OutlierClipper(BaseEstimator, TransformerMixin):
-    def __init__(self, cols, lower=0.01, upper=0.99):
-        self.cols = cols
-        self.lower = lower
-        self.upper = upper
-
-    def fit(self, X, y=None):
-        self.bounds = {}
-        for col in self.cols:
-            self.bounds[col] = (
-                np.quantile(X[col], self.lower),
-                np.quantile(X[col], self.upper)
-            )
-        return self
-
-    def transform(self, X):
-        X = X.copy()
-        for col in self.cols:
-            low, high = self.bounds[col]
-            X[col] = np.clip(X[col], low, high)
-        return X
-
-class FeatureEngineer(BaseEstimator, TransformerMixin):
-    def fit(self, X, y=None):
-        return self
-
-    def transform(self, X):
-        X = X.copy()
-        X["inactive_flag"] = X["last_login_days"].apply(lambda x: 1 if x > 30 else 0)
-        X["engagement_ratio"] = X["watch_hours"] / (X["last_login_days"] + 1)
-        return X
+# Shared with the offline tools; the names must live in this module to unpickle the pipeline.
+from churn_pipeline import MissingValueHandler, OutlierClipper, FeatureEngineer  # noqa: F401
+from churn_pipeline import CHURN_THRESHOLD, MODEL_PATH, warm_up
+from prob_calibration import calibrated
+from session_record import VOCAB, SessionRecord
 
 # ----------------- Load Model -----------------
-pipeline = joblib.load("NetflixChurn_pipeline.pkl")
+# Calibration table (python prob_calibration.py fit) applied after the pipeline; unchanged if there is none
+pipeline = calibrated(joblib.load(MODEL_PATH), MODEL_PATH)
+# Warmed right after load so the first user doesn't pay the cold-start cost
+warm_up(pipeline)
 
-def predict_churn(user_input_df):
-    prob = pipeline.predict_proba(user_input_df)[:, 1][0] * 100
-    if prob > 65:
-        color = "red"
-        message = "⚠ High Risk! Consider reaching out to the customer."
-    else:
-        color = "green"
-        message = "✔ Low Risk"
-    return round(prob, 2), color, message
+def predict_churn(record):
+    return round(float(pipeline.predict_proba(record.frame())[:, 1][0]) * 100, 2)
+
+def risk_display(prob):
+    # A score equal to the cut-off is High, as in risk_band() and calibrate.py (the original check was > 65)
+    if prob >= CHURN_THRESHOLD:
+        return "red", "⚠ High Risk! Consider reaching out to the customer."
+    return "green", "✔ Low Risk"
 
 # ----------------- Helper to Center Inputs -----------------
 def center_input(widget_func, label, *args, **kwargs):
@@ -122,7 +81,7 @@ def center_input(widget_func, label, *args, **kwargs):
 # ----------------- Input Form -----------------
 st.markdown("<div style='height:40px'></div>", unsafe_allow_html=True)
 
-gender = center_input(st.selectbox, "Please select your Gender : ", ["Select", "Male", "Female", "Other"], key="gender")
+gender = center_input(st.selectbox, "Please select your Gender : ", ["Select", *VOCAB["gender"]], key="gender")
 age_input = center_input(st.text_input, "Please enter your Age : ", key="age", placeholder="Type your age")
 age = None
 if age_input:
@@ -134,7 +93,7 @@ if age_input:
     except ValueError:
         st.warning("Please enter a valid number for age")
 
-subscription_type = center_input(st.selectbox, "Please select your Subscription Type : ", ["Select", "Basic", "Standard", "Premium"], key="subscription_type")
+subscription_type = center_input(st.selectbox, "Please select your Subscription Type : ", ["Select", *VOCAB["subscription_type"]], key="subscription_type")
 watch_hours_input = center_input(st.text_input, "How many Watch Hours per week?", key="watch_hours", placeholder="0-168")
 watch_hours = None
 if watch_hours_input:
@@ -158,32 +117,24 @@ if last_login_input:
         st.warning("Enter a valid number")
 
 no_of_devices = center_input(st.selectbox, "Please enter number of devices are linked : ", [1,2,3,4,5], key="no_of_devices")
-region = center_input(st.selectbox, "Please select your Region :", ["Select", "South America", "Europe", "North America", "Asia", "Africa", "Oceania"], key="region")
-device = center_input(st.selectbox, "Please select your Device : ", ["Select", "Tablet", "Laptop", "Mobile", "TV", "Desktop"], key="device")
-payment_method = center_input(st.selectbox, "Please select your Payment Method : ", ["Select", "Debit Card", "PayPal", "Crypto", "Gift Card", "Credit Card"], key="payment_method")
-favorite_genre = center_input(st.selectbox, "Please select your Favourite Genre : ", ["Select", "Drama", "Documentary", "Romance", "Sci-Fi", "Horror", "Action", "Comedy"], key="favorite_genre")
-avg_watch_time_per_day = center_input(st.number_input, "What is average watch time per day in hours?", min_value=0.0, max_value=24.0, step=0.1)
-number_of_profiles = center_input(st.selectbox, "Please select no of profiles : ", [1,2,3,4,5])
+region = center_input(st.selectbox, "Please select your Region :", ["Select", *VOCAB["region"]], key="region")
+device = center_input(st.selectbox, "Please select your Device : ", ["Select", *VOCAB["device"]], key="device")
+payment_method = center_input(st.selectbox, "Please select your Payment Method : ", ["Select", *VOCAB["payment_method"]], key="payment_method")
+favorite_genre = center_input(st.selectbox, "Please select your Favourite Genre : ", ["Select", *VOCAB["favorite_genre"]], key="favorite_genre")
+avg_watch_time_per_day = center_input(st.number_input, "What is average watch time per day in hours?", min_value=0.0, max_value=24.0, step=0.1, key="avg_watch_time_per_day")
+number_of_profiles = center_input(st.selectbox, "Please select no of profiles : ", [1,2,3,4,5], key="number_of_profiles")
 
 # ----------------- Buttons -----------------
 st.markdown("<div style='height:20px'></div>", unsafe_allow_html=True)
 col3,col1, col2,col4 = st.columns([2.2,0.8,0.8,1.8])
 
+FORM_KEYS = ["gender", "subscription_type", "age", "watch_hours", "last_login_days", "no_of_devices", "region",
+             "device", "payment_method", "favorite_genre", "avg_watch_time_per_day", "number_of_profiles"]
+
 def reset_all():
-    st.session_state.update({
-        "gender": "Select",
-        "subscription_type": "Select",
-        "age": "",
-        "watch_hours": "",
-        "last_login_days": "",
-        "no_of_devices": 1,
-        "region": "Select",
-        "device": "Select",
-        "payment_method": "Select",
-        "favorite_genre": "Select",
-        "avg_watch_time_per_day": 0.0,
-        "number_of_profiles": 1
-    })
+    # Dropping a widget's key puts it back to its default; nothing is stored per session for it.
+    for key in FORM_KEYS:
+        st.session_state.pop(key, None)
     st.success("Data reset successfully!")
 
 with col1:
@@ -194,7 +145,7 @@ with col2:
         if gender=="Select" or subscription_type=="Select" or region=="Select" or device=="Select" or payment_method=="Select" or favorite_genre=="Select":
             st.warning("Please select valid options for all fields")
         else:
-            user_input = pd.DataFrame([{
+            record = SessionRecord({
                 "age": age,
                 "gender": gender,
                 "subscription_type": subscription_type,
@@ -207,18 +158,16 @@ with col2:
                 "favorite_genre": favorite_genre,
                 "avg_watch_time_per_day": avg_watch_time_per_day,
                 "number_of_profiles": number_of_profiles
-            }])
-            churn_prob, color, message = predict_churn(user_input)
-            st.session_state["churn_prob"] = churn_prob
-            st.session_state["churn_color"] = color
-            st.session_state["churn_message"] = message
+            })
+            record.prob = predict_churn(record)
+            # One slotted record per session instead of loose result keys.
+            st.session_state["record"] = record
 
 # ----------------- Display Churn -----------------
 st.markdown("<div style='height:30px'></div>", unsafe_allow_html=True)
-if "churn_prob" in st.session_state:
-    churn_prob = st.session_state["churn_prob"]
-    color = st.session_state["churn_color"]
-    message = st.session_state["churn_message"]
+if "record" in st.session_state:
+    churn_prob = st.session_state["record"].prob
+    color, message = risk_display(churn_prob)
 
     st.markdown(
         f"""
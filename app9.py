@@ -1,13 +1,12 @@
 # app.py - Netflix Churn Prediction (Enhanced UI/UX)
 import streamlit as st
 import pandas as pd
-import joblib
+import os
 import time
 import base64
 import numpy as np
 import seaborn as sns
 import matplotlib.pyplot as plt
-from sklearn.base import BaseEstimator, TransformerMixin
 
 # ----------------- Page Setup -----------------
 st.set_page_config(
@@ -214,67 +213,93 @@ with header_col2:
 st.markdown("<br>", unsafe_allow_html=True)
 
 # ----------------- Pipeline Helper Classes -----------------
-class MissingValueHandler(BaseEstimator, TransformerMixin):
-    def __init__(self, numeric_cols, categorical_cols):
-        self.numeric_cols = numeric_cols
-        self.categorical_cols = categorical_cols
-
-    def fit(self, X, y=None):
-        self.num_median = X[self.numeric_cols].median()
-        self.cat_mode = X[self.categorical_cols].mode().iloc[0]
-        return self
-
-    def transform(self, X):
-        X = X.copy()
-        X[self.numeric_cols] = X[self.numeric_cols].fillna(self.num_median)
-        X[self.categorical_cols] = X[self.categorical_cols].fillna(self.cat_mode)
-        return X
-
-class OutlierClipper(BaseEstimator, TransformerMixin):
-    def __init__(self, cols, lower=0.01, upper=0.99):
-        self.cols = cols
-        self.lower = lower
-        self.upper = upper
-
-    def fit(self, X, y=None):
-        self.bounds = {}
-        for col in self.cols:
-            self.bounds[col] = (
-                np.quantile(X[col], self.lower),
-                np.quantile(X[col], self.upper)
-            )
-        return self
-
-    def transform(self, X):
-        X = X.copy()
-        for col in self.cols:
-            low, high = self.bounds[col]
-            X[col] = np.clip(X[col], low, high)
-        return X
-
-class FeatureEngineer(BaseEstimator, TransformerMixin):
-    def fit(self, X, y=None):
-        return self
-
-    def transform(self, X):
-        X = X.copy()
-        X["inactive_flag"] = X["last_login_days"].apply(lambda x: 1 if x > 30 else 0)
-        X["engagement_ratio"] = X["watch_hours"] / (X["last_login_days"] + 1)
-        return X
+# Shared with the offline tools; the names must live in this module to unpickle the pipeline.
+from churn_pipeline import MissingValueHandler, OutlierClipper, FeatureEngineer  # noqa: F401
+from fast_path import DISTILLED_PATH, FastPathScorer
+from explain import TreePathExplainer, input_sources, top_drivers
+from insights import action_codes, decode, render_html
+from model_registry import ModelRegistry
+from audit_log import AuditLog
+from drift import DriftMonitor
+from prob_calibration import calibrated
+from neighbors import NEIGHBORS_PATH, NeighborIndex
+from counterfactual import render_html as render_counterfactuals, search as counterfactual_search
+from metrics import CACHE, LATENCY, MODEL_LOAD_SECONDS, PREDICTIONS, samples, start_http_server
+from churn_pipeline import CHURN_THRESHOLD, risk_band
+from session_record import VOCAB, SessionRecord
 
 # ----------------- Load Model -----------------
-# Kept exactly the same path & logic as your original file
-pipeline = joblib.load("C:/Users/Ayush Jindal/OneDrive/Desktop/Netflix Churn rate Prediction/NetflixChurn_pipeline.pkl")
+# Kept exactly the same path as your original file
+MODEL_FILE = "C:/Users/Ayush Jindal/OneDrive/Desktop/Netflix Churn rate Prediction/NetflixChurn_pipeline.pkl"
+
+def build_explainer(pipeline):
+    # Per-customer explanations; falls back to global importances for non-tree models
+    try:
+        return TreePathExplainer(pipeline)
+    except TypeError:
+        return None
+
+def build_calibrated(pipeline):
+    # Calibration table (python prob_calibration.py fit) applied after the pipeline; unchanged if there is none
+    return calibrated(pipeline, MODEL_FILE)
+
+def build_fast_scorer(pipeline):
+    # Distilled fast path (python fast_path.py distill); near a risk threshold it defers to the full pipeline
+    # None as well when it was distilled from another artifact (e.g. after a hot-swap)
+    return FastPathScorer.load(build_calibrated(pipeline), model_path=MODEL_FILE) if os.path.exists(DISTILLED_PATH) else None
+
+@st.cache_resource(show_spinner=False)
+def get_registry():
+    # Shared by all sessions; a replaced .pkl is loaded and warmed in the background, then swapped in
+    return ModelRegistry(MODEL_FILE, extras={"calibrated": build_calibrated, "fast_scorer": build_fast_scorer,
+                                              "explainer": build_explainer}).start()
+
+@st.cache_resource(show_spinner=False)
+def get_audit_log():
+    # Every score is kept; record() only buffers, a background thread writes audit_log.<pid>.jsonl.gz
+    return AuditLog().start()
+
+@st.cache_resource(show_spinner=False)
+def get_drift_monitor():
+    # Bin counts of every submitted customer vs the netflix_churn.csv baseline, shared by all sessions
+    return DriftMonitor.from_baseline()
+
+@st.cache_resource(show_spinner=False)
+def get_neighbor_index():
+    # Prebuilt by `python neighbors.py build`; without it the "Customers like this" table is skipped
+    return NeighborIndex.load() if os.path.exists(NEIGHBORS_PATH) else None
+
+@st.cache_resource(show_spinner=False)
+def get_metrics_server():
+    # Prometheus scrape endpoint (CHURN_METRICS_PORT, default 9108); skipped if another app holds the port
+    try:
+        return start_http_server()
+    except OSError:
+        return None
+
+get_metrics_server()
+
+# One snapshot per script run, so a run that started on the old model finishes on it
+snapshot = get_registry().current
+pipeline = snapshot.extras["calibrated"]
+fast_scorer = snapshot.extras["fast_scorer"]
+explainer = snapshot.extras["explainer"]
 
 def predict_churn(user_input_df):
-    prob = pipeline.predict_proba(user_input_df)[:, 1][0] * 100
-    if prob > 65:
-        color = "red"
-        message = "⚠ High Risk! Consider reaching out to the customer."
+    start = time.perf_counter()
+    if fast_scorer is not None:
+        prob = fast_scorer.score_frame(user_input_df)[0][0]
     else:
-        color = "green"
-        message = "✔ Low Risk"
-    return round(prob, 2), color, message
+        prob = pipeline.predict_proba(user_input_df)[:, 1][0] * 100
+    LATENCY.labels(path="ui").observe(time.perf_counter() - start)
+    PREDICTIONS.labels(path="ui").inc()
+    return round(float(prob), 2)
+
+def risk_display(prob):
+    # A score equal to the cut-off is High, as in risk_band() and calibrate.py (the original check was > 65)
+    if prob >= CHURN_THRESHOLD:
+        return "red", "⚠ High Risk! Consider reaching out to the customer."
+    return "green", "✔ Low Risk"
 
 # ----------------- Helper to Center Inputs -----------------
 def center_input(widget_func, label, *args, **kwargs):
@@ -296,7 +321,7 @@ with left_col:
         gender = center_input(
             st.selectbox,
             "Please select your Gender : ",
-            ["Select", "Male", "Female", "Other"],
+            ["Select", *VOCAB["gender"]],
             key="gender",
         )
 
@@ -319,7 +344,7 @@ with left_col:
         subscription_type = center_input(
             st.selectbox,
             "Please select your Subscription Type : ",
-            ["Select", "Basic", "Standard", "Premium"],
+            ["Select", *VOCAB["subscription_type"]],
             key="subscription_type",
         )
 
@@ -362,6 +387,7 @@ with left_col:
             min_value=0.0,
             max_value=24.0,
             step=0.1,
+            key="avg_watch_time_per_day",
         )
 
     with account_tab:
@@ -375,28 +401,28 @@ with left_col:
         region = center_input(
             st.selectbox,
             "Please select your Region :",
-            ["Select", "South America", "Europe", "North America", "Asia", "Africa", "Oceania"],
+            ["Select", *VOCAB["region"]],
             key="region",
         )
 
         device = center_input(
             st.selectbox,
             "Please select your Device : ",
-            ["Select", "Tablet", "Laptop", "Mobile", "TV", "Desktop"],
+            ["Select", *VOCAB["device"]],
             key="device",
         )
 
         payment_method = center_input(
             st.selectbox,
             "Please select your Payment Method : ",
-            ["Select", "Debit Card", "PayPal", "Crypto", "Gift Card", "Credit Card"],
+            ["Select", *VOCAB["payment_method"]],
             key="payment_method",
         )
 
         favorite_genre = center_input(
             st.selectbox,
             "Please select your Favourite Genre : ",
-            ["Select", "Drama", "Documentary", "Romance", "Sci-Fi", "Horror", "Action", "Comedy"],
+            ["Select", *VOCAB["favorite_genre"]],
             key="favorite_genre",
         )
 
@@ -404,6 +430,7 @@ with left_col:
             st.selectbox,
             "Please select no of profiles : ",
             [1, 2, 3, 4, 5],
+            key="number_of_profiles",
         )
 
     st.markdown("<hr style='border: 0.5px solid #333333; margin: 12px 0 16px 0;'>",
@@ -412,21 +439,13 @@ with left_col:
     # ----------------- Buttons -----------------
     btn_col1, btn_col2, _ = st.columns([1, 1, 2])
 
+    FORM_KEYS = ["gender", "subscription_type", "age", "watch_hours", "last_login_days", "no_of_devices", "region",
+                 "device", "payment_method", "favorite_genre", "avg_watch_time_per_day", "number_of_profiles"]
+
     def reset_all():
-        st.session_state.update({
-            "gender": "Select",
-            "subscription_type": "Select",
-            "age": "",
-            "watch_hours": "",
-            "last_login_days": "",
-            "no_of_devices": 1,
-            "region": "Select",
-            "device": "Select",
-            "payment_method": "Select",
-            "favorite_genre": "Select",
-            "avg_watch_time_per_day": 0.0,
-            "number_of_profiles": 1
-        })
+        # Dropping a widget's key puts it back to its default; nothing is stored per session for it.
+        for key in FORM_KEYS:
+            st.session_state.pop(key, None)
         st.success("All fields have been reset.")
 
     with btn_col1:
@@ -444,7 +463,7 @@ with left_col:
             ):
                 st.warning("Please select valid options for all mandatory fields.")
             else:
-                user_input = pd.DataFrame([{
+                record = SessionRecord({
                     "age": age,
                     "gender": gender,
                     "subscription_type": subscription_type,
@@ -457,28 +476,38 @@ with left_col:
                     "favorite_genre": favorite_genre,
                     "avg_watch_time_per_day": avg_watch_time_per_day,
                     "number_of_profiles": number_of_profiles
-                }])
+                })
+                user_input = record.frame()
 
                 # --- Prediction ---
-                churn_prob, color, message = predict_churn(user_input)
-                st.session_state["churn_prob"] = churn_prob
-                st.session_state["churn_color"] = color
-                st.session_state["churn_message"] = message
-
-                # --- Feature Importance (unchanged logic) ---
-                model = pipeline.named_steps["model"]
-                try:
-                    feature_names = pipeline.named_steps["preprocessor"].get_feature_names_out()
-                except:
-                    feature_names = [
-                        "age", "gender", "subscription_type", "watch_hours",
-                        "last_login_days", "region", "device", "payment_method",
-                        "number_of_profiles", "avg_watch_time_per_day", "favorite_genre"
-                    ]
-
-                importances = model.feature_importances_
-                feat_imp_df = pd.DataFrame({"Feature": feature_names, "Importance": importances})
-                top_features = feat_imp_df.sort_values(by="Importance", ascending=False).head(5)
+                churn_prob = record.prob = predict_churn(user_input)
+                # One slotted record per session; colour, message and neighbours are derived when shown.
+                st.session_state["record"] = record
+                get_drift_monitor().update_record(record.inputs())
+                get_audit_log().record(record.inputs(), churn_prob, risk_band(churn_prob), snapshot.version[2])
+
+                # --- What drives this customer's score (tree-path attributions) ---
+                if explainer is not None:
+                    contributions = explainer.explain(user_input)
+                    top_features = pd.DataFrame({"Feature": top_drivers(contributions, k=5)[0]})
+                else:
+                    # --- Global feature importance (model not supported by the explainer) ---
+                    model = pipeline.named_steps["model"]
+                    try:
+                        feature_names = pipeline.named_steps["preprocessor"].get_feature_names_out()
+                    except:
+                        feature_names = [
+                            "age", "gender", "subscription_type", "watch_hours",
+                            "last_login_days", "region", "device", "payment_method",
+                            "number_of_profiles", "avg_watch_time_per_day", "favorite_genre"
+                        ]
+
+                    if hasattr(model, "feature_importances_"):
+                        feat_imp_df = pd.DataFrame({"Feature": feature_names, "Importance": model.feature_importances_})
+                        top_features = feat_imp_df.sort_values(by="Importance", ascending=False).head(5)
+                    else:
+                        # e.g. train_hgb.py's boosted model: no importances, every input counts as a driver
+                        top_features = pd.DataFrame({"Feature": feature_names})
 
                 # --- Business Insights (same conditions, upgraded styling) ---
                 st.markdown("<br>", unsafe_allow_html=True)
@@ -487,37 +516,17 @@ with left_col:
                 with st.container():
                     st.markdown('<div class="insights-card">', unsafe_allow_html=True)
 
-                    for feature in top_features["Feature"]:
-                        if "last_login_days" in feature:
-                            st.markdown(
-                                '<p>- Customers inactive for many days are more likely to churn. '
-                                '<b>Action:</b> Trigger re-engagement emails or time-bound offers.</p>',
-                                unsafe_allow_html=True,
-                            )
-                        elif "avg_watch_time_per_day" in feature:
-                            st.markdown(
-                                '<p>- Low daily engagement signals rising churn risk. '
-                                '<b>Action:</b> Push personalized watchlists and reminders.</p>',
-                                unsafe_allow_html=True,
-                            )
-                        elif "subscription_type" in feature:
-                            st.markdown(
-                                '<p>- Basic plan users may be more price sensitive and churn more often. '
-                                '<b>Action:</b> Provide targeted upgrade offers to Standard/Premium.</p>',
-                                unsafe_allow_html=True,
-                            )
-                        elif "region" in feature:
-                            st.markdown(
-                                '<p>- Some regions exhibit higher churn patterns. '
-                                '<b>Action:</b> Localize content and marketing campaigns.</p>',
-                                unsafe_allow_html=True,
-                            )
-                        elif "payment_method" in feature:
-                            st.markdown(
-                                '<p>- Gift card or non-recurring payment methods may lead to faster churn. '
-                                '<b>Action:</b> Encourage auto-renewal or card-on-file options.</p>',
-                                unsafe_allow_html=True,
-                            )
+                    # Rules fire on the profile; show the ones tied to this customer's top drivers
+                    code = action_codes(user_input.assign(churn_prob=churn_prob))[0]
+                    # Drivers are raw inputs (explainer) or preprocessor outputs (importances); compare input names
+                    drivers = {source for f in top_features["Feature"] for source in input_sources(f)}
+                    shown = [r for r in decode(code) if r.feature is None or r.feature in drivers]
+                    st.markdown(render_html(shown), unsafe_allow_html=True)
+
+                    # Cheapest actionable changes that bring this customer back under the cut-off
+                    if churn_prob >= CHURN_THRESHOLD:
+                        suggestions, _ = counterfactual_search(pipeline, user_input.iloc[0].to_dict(), target=CHURN_THRESHOLD)
+                        st.markdown(render_counterfactuals(suggestions, CHURN_THRESHOLD), unsafe_allow_html=True)
 
                     st.markdown("</div>", unsafe_allow_html=True)
 
@@ -529,10 +538,10 @@ with right_col:
     st.markdown('<div class="section-title">Churn Risk Summary</div>', unsafe_allow_html=True)
     st.markdown("<br>", unsafe_allow_html=True)
 
-    if "churn_prob" in st.session_state:
-        churn_prob = st.session_state["churn_prob"]
-        color = st.session_state["churn_color"]
-        message = st.session_state["churn_message"]
+    if "record" in st.session_state:
+        record = st.session_state["record"]
+        churn_prob = record.prob
+        color, message = risk_display(churn_prob)
 
         # Map color to gradient/badge
         if color == "red":
@@ -554,6 +563,23 @@ with right_col:
             """,
             unsafe_allow_html=True,
         )
+
+        # --- Customers like this: nearest real customers and what happened to them ---
+        # Looked up again on every run (under a millisecond) rather than kept per session
+        neighbor_index = get_neighbor_index()
+        similar = neighbor_index.query(record.inputs(), k=10) if neighbor_index is not None else None
+        if similar is not None:
+            scope = "same plan and region" if similar.attrs.get("same_key") else "all plans and regions"
+            st.markdown(
+                f'<div class="churn-label">Customers like this: <b>{similar["churned"].mean():.0%}</b> '
+                f'of the {len(similar)} most similar ({scope}) churned</div>',
+                unsafe_allow_html=True,
+            )
+            st.dataframe(
+                similar.drop(columns=["customer_id", "distance"]).rename(columns={"churn_prob": "score %"}),
+                hide_index=True,
+                use_container_width=True,
+            )
     else:
         st.markdown(
             """
@@ -565,3 +591,31 @@ with right_col:
         )
 
     st.markdown("</div>", unsafe_allow_html=True)
+
+# ----------------- Metrics Panel -----------------
+# Same counters as the /metrics endpoint, for this Streamlit process
+with st.expander("📈 Scoring metrics"):
+    ui_latency = LATENCY.labels(path="ui")
+    hits = CACHE.labels(cache="fast_path", result="hit").value()
+    misses = CACHE.labels(cache="fast_path", result="miss").value()
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Predictions served", int(PREDICTIONS.labels(path="ui").value()))
+    if ui_latency.value()[1]:
+        m2.metric("Latency p50 / p95", f"{ui_latency.quantile(0.5) * 1000:.0f} / {ui_latency.quantile(0.95) * 1000:.0f} ms")
+    else:
+        m2.metric("Latency p50 / p95", "–")
+    m3.metric("Fast-path hit rate", f"{hits / (hits + misses):.0%}" if hits + misses else "–")
+    m4.metric("Model load time", f"{MODEL_LOAD_SECONDS.labels().value():.2f} s")
+    st.dataframe(
+        pd.DataFrame(
+            [(name, ", ".join(f"{k}={v}" for k, v in labels.items()), value)
+             for name, labels, value in samples() if not name.endswith("_bucket")],
+            columns=["metric", "labels", "value"],
+        ),
+        hide_index=True,
+        use_container_width=True,
+    )
+    drift = get_drift_monitor()
+    if drift.rows:
+        st.markdown(f"**Input drift** vs training data ({drift.rows} customers scored)")
+        st.dataframe(drift.report().head(5), hide_index=True, use_container_width=True)
@@ -5,27 +5,13 @@ import joblib
 import time
 import base64
 import numpy as np
-from sklearn.base import BaseEstimator, TransformerMixin
+from churn_pipeline import HIGH_RISK_THRESHOLD, MODEL_PATH, MODERATE_RISK_THRESHOLD, warm_up
+from prob_calibration import calibrated
+from session_record import VOCAB, SessionRecord
 
-# ----------------- Dummy Classes for Compatibility -----------------
-class MissingValueHandler(BaseEstimator, TransformerMixin):
-    def __init__(self, numeric_cols=None, categorical_cols=None):
-        self.numeric_cols = numeric_cols or []
-        self.categorical_cols = categorical_cols or []
-    def fit(self, X, y=None): return self
-    def transform(self, X): return X
-
-class OutlierClipper(BaseEstimator, TransformerMixin):
-    def __init__(self, cols=None, lower=0.01, upper=0.99):
-        self.cols = cols or []
-        self.lower = lower
-        self.upper = upper
-    def fit(self, X, y=None): return self
-    def transform(self, X): return X
-
-class FeatureEngineer(BaseEstimator, TransformerMixin):
-    def fit(self, X, y=None): return self
-    def transform(self, X): return X
+# ----------------- Pipeline Helper Classes -----------------
+# Shared with the offline tools; the names must live in this module to unpickle the pipeline.
+from churn_pipeline import MissingValueHandler, OutlierClipper, FeatureEngineer  # noqa: F401
 
 # ----------------- Page Setup -----------------
 st.set_page_config(
@@ -98,24 +84,24 @@ st.markdown(
 def load_model():
     with st.spinner("🔄 Loading model..."):
         time.sleep(1)
-        pipeline = joblib.load("NetflixChurn_pipeline.pkl")
-    return pipeline
+        pipeline = joblib.load(MODEL_PATH)
+        # Warmed right after load so the first user doesn't pay the cold-start cost
+        warm_up(pipeline)
+    # Calibration table (python prob_calibration.py fit) applied after the pipeline; unchanged if there is none
+    return calibrated(pipeline, MODEL_PATH)
 
 pipeline = load_model()
 
 # ----------------- Prediction Logic -----------------
-def predict_churn(user_input_df):
-    prob = pipeline.predict_proba(user_input_df)[:, 1][0] * 100
-    if prob >= 75:
-        color = "red"
-        message = "⚠ High Risk! Consider reaching out to the customer."
-    elif prob >= 50:
-        color = "orange"
-        message = "🟠 Moderate Risk. Offer incentives to retain."
-    else:
-        color = "green"
-        message = "✔ Low Risk. Customer likely to stay."
-    return round(prob, 2), color, message
+def predict_churn(record):
+    return round(float(pipeline.predict_proba(record.frame())[:, 1][0]) * 100, 2)
+
+def risk_display(prob):
+    if prob >= HIGH_RISK_THRESHOLD:
+        return "red", "⚠ High Risk! Consider reaching out to the customer."
+    if prob >= MODERATE_RISK_THRESHOLD:
+        return "orange", "🟠 Moderate Risk. Offer incentives to retain."
+    return "green", "✔ Low Risk. Customer likely to stay."
 
 # ----------------- Center Input Helper -----------------
 def center_input(widget_func, label, *args, **kwargs):
@@ -126,7 +112,7 @@ def center_input(widget_func, label, *args, **kwargs):
 # ----------------- Input Form -----------------
 st.markdown("<div style='height:40px'></div>", unsafe_allow_html=True)
 
-gender = center_input(st.selectbox, "Please select your Gender : ", ["Select", "Male", "Female", "Other"], key="gender")
+gender = center_input(st.selectbox, "Please select your Gender : ", ["Select", *VOCAB["gender"]], key="gender")
 age_input = center_input(st.text_input, "Please enter your Age : ", key="age", placeholder="Type your age")
 age = None
 if age_input:
@@ -138,7 +124,7 @@ if age_input:
     except ValueError:
         st.warning("Please enter a valid number for age")
 
-subscription_type = center_input(st.selectbox, "Please select your Subscription Type : ", ["Select", "Basic", "Standard", "Premium"], key="subscription_type")
+subscription_type = center_input(st.selectbox, "Please select your Subscription Type : ", ["Select", *VOCAB["subscription_type"]], key="subscription_type")
 watch_hours_input = center_input(st.text_input, "How many Watch Hours per week?", key="watch_hours", placeholder="0-168")
 watch_hours = None
 if watch_hours_input:
@@ -162,32 +148,24 @@ if last_login_input:
         st.warning("Enter a valid number")
 
 no_of_devices = center_input(st.selectbox, "Please enter number of devices are linked : ", [1,2,3,4,5], key="no_of_devices")
-region = center_input(st.selectbox, "Please select your Region :", ["Select", "South America", "Europe", "North America", "Asia", "Africa", "Oceania"], key="region")
-device = center_input(st.selectbox, "Please select your Device : ", ["Select", "Tablet", "Laptop", "Mobile", "TV", "Desktop"], key="device")
-payment_method = center_input(st.selectbox, "Please select your Payment Method : ", ["Select", "Debit Card", "PayPal", "Crypto", "Gift Card", "Credit Card"], key="payment_method")
-favorite_genre = center_input(st.selectbox, "Please select your Favourite Genre : ", ["Select", "Drama", "Documentary", "Romance", "Sci-Fi", "Horror", "Action", "Comedy"], key="favorite_genre")
-avg_watch_time_per_day = center_input(st.number_input, "What is average watch time per day in hours?", min_value=0.0, max_value=24.0, step=0.1)
-number_of_profiles = center_input(st.selectbox, "Please select no of profiles : ", [1,2,3,4,5])
+region = center_input(st.selectbox, "Please select your Region :", ["Select", *VOCAB["region"]], key="region")
+device = center_input(st.selectbox, "Please select your Device : ", ["Select", *VOCAB["device"]], key="device")
+payment_method = center_input(st.selectbox, "Please select your Payment Method : ", ["Select", *VOCAB["payment_method"]], key="payment_method")
+favorite_genre = center_input(st.selectbox, "Please select your Favourite Genre : ", ["Select", *VOCAB["favorite_genre"]], key="favorite_genre")
+avg_watch_time_per_day = center_input(st.number_input, "What is average watch time per day in hours?", min_value=0.0, max_value=24.0, step=0.1, key="avg_watch_time_per_day")
+number_of_profiles = center_input(st.selectbox, "Please select no of profiles : ", [1,2,3,4,5], key="number_of_profiles")
 
 # ----------------- Buttons -----------------
 st.markdown("<div style='height:20px'></div>", unsafe_allow_html=True)
 col3, col1, col2, col4 = st.columns([2.2,0.8,0.8,1.8])
 
+FORM_KEYS = ["gender", "subscription_type", "age", "watch_hours", "last_login_days", "no_of_devices", "region",
+             "device", "payment_method", "favorite_genre", "avg_watch_time_per_day", "number_of_profiles"]
+
 def reset_all():
-    st.session_state.update({
-        "gender": "Select",
-        "subscription_type": "Select",
-        "age": "",
-        "watch_hours": "",
-        "last_login_days": "",
-        "no_of_devices": 1,
-        "region": "Select",
-        "device": "Select",
-        "payment_method": "Select",
-        "favorite_genre": "Select",
-        "avg_watch_time_per_day": 0.0,
-        "number_of_profiles": 1
-    })
+    # Dropping a widget's key puts it back to its default; nothing is stored per session for it.
+    for key in FORM_KEYS:
+        st.session_state.pop(key, None)
     st.success("Data reset successfully!")
 
 with col1:
@@ -198,7 +176,7 @@ with col2:
         if gender=="Select" or subscription_type=="Select" or region=="Select" or device=="Select" or payment_method=="Select" or favorite_genre=="Select":
             st.warning("Please select valid options for all fields")
         else:
-            user_input = pd.DataFrame([{
+            record = SessionRecord({
                 "age": age,
                 "gender": gender,
                 "subscription_type": subscription_type,
@@ -211,21 +189,16 @@ with col2:
                 "favorite_genre": favorite_genre,
                 "avg_watch_time_per_day": avg_watch_time_per_day,
                 "number_of_profiles": number_of_profiles
-            }])
-            churn_prob, color, message = predict_churn(user_input)
-            st.session_state.update({
-                "churn_prob": churn_prob,
-                "churn_color": color,
-                "churn_message": message,
-                "user_input": user_input
             })
+            record.prob = predict_churn(record)
+            # One slotted record per session instead of a DataFrame and loose result keys.
+            st.session_state["record"] = record
 
 # ----------------- Display Result -----------------
 st.markdown("<div style='height:30px'></div>", unsafe_allow_html=True)
-if "churn_prob" in st.session_state:
-    churn_prob = st.session_state["churn_prob"]
-    color = st.session_state["churn_color"]
-    message = st.session_state["churn_message"]
+if "record" in st.session_state:
+    churn_prob = st.session_state["record"].prob
+    color, message = risk_display(churn_prob)
 
     st.markdown(
         f"""
@@ -238,7 +211,7 @@ if "churn_prob" in st.session_state:
     )
 
     # ---- Business Insights ----
-    if churn_prob >= 75:
+    if churn_prob >= HIGH_RISK_THRESHOLD:
         if st.button("Show Business Insights"):
             st.markdown("""
             <div style='background-color: rgba(255,0,0,0.1); padding: 20px; border-radius: 10px;'>
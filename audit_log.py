@@ -0,0 +1,250 @@
+# audit_log.py - Append-only audit log of every churn score
+#
+# record() only copies the entry into a fixed-size in-memory ring buffer; a
+# background thread drains the ring every `flush_interval` seconds (or when it
+# is half full) and appends the batch to a gzip file as JSON lines. Each flush
+# is its own gzip member, so the file is only ever appended to. If the ring
+# fills faster than it is flushed, record() waits up to `max_wait` seconds for
+# the flusher, then drops the entry and counts it; a failed write is counted
+# and reported in stats() and the flusher keeps going.
+#
+# Appends from two processes can interleave inside one file, so every process
+# writes its own audit_log.<pid>.jsonl.gz; the reader merges all of them.
+#
+#   python audit_log.py                          # summary of every audit_log.*.jsonl.gz
+#   python audit_log.py --out audit.csv          # replay the whole log to CSV
+import argparse
+import atexit
+import glob
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+# {pid} is filled in per process; read_audit_log() globs it.
+AUDIT_PATH = "audit_log.{pid}.jsonl.gz"
+GZIP_MAGIC = b"\x1f\x8b\x08"
+
+
+def _json_default(value):
+    # Inputs taken from DataFrame rows carry NumPy scalars.
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class AuditLog:
+    def __init__(self, path=AUDIT_PATH, capacity=4096, flush_interval=1.0, max_wait=1.0):
+        self.path = path.format(pid=os.getpid())
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.max_wait = max_wait
+        self._ring = [None] * capacity
+        self._head = 0  # oldest unflushed entry
+        self._size = 0
+        self._cond = threading.Condition()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._write_lock = threading.Lock()
+        self._thread = None
+        self.written = 0
+        self.waits = 0
+        self.dropped = 0
+        self.write_errors = 0
+        self.last_error = None
+
+    def record(self, inputs, churn_prob, risk_band, model_version):
+        """Queue one scored customer; serialization and I/O happen on the flusher thread."""
+        entry = (time.time(), model_version, float(churn_prob), str(risk_band), dict(inputs))
+        with self._cond:
+            deadline = time.monotonic() + self.max_wait
+            while self._size == self.capacity:
+                remaining = deadline - time.monotonic()
+                # Scoring must never hang on the audit trail: no flusher, or it can't keep up -> drop.
+                if self._thread is None or not self._thread.is_alive() or remaining <= 0:
+                    self.dropped += 1
+                    return
+                self.waits += 1
+                self._wake.set()
+                self._cond.wait(remaining)
+            self._ring[(self._head + self._size) % self.capacity] = entry
+            self._size += 1
+            if self._size >= self.capacity // 2:
+                self._wake.set()
+
+    def _drain(self):
+        with self._cond:
+            batch = []
+            for i in range(self._size):
+                slot = (self._head + i) % self.capacity
+                batch.append(self._ring[slot])
+                self._ring[slot] = None
+            self._head = (self._head + self._size) % self.capacity
+            self._size = 0
+            self._cond.notify_all()
+        return batch
+
+    def flush(self):
+        batch = self._drain()
+        if not batch:
+            return 0
+        try:
+            lines = "".join(
+                json.dumps({"ts": ts, "model_version": version, "churn_prob": prob, "risk_band": band, **inputs},
+                           default=_json_default) + "\n"
+                for ts, version, prob, band, inputs in batch
+            )
+            with self._write_lock, gzip.open(self.path, "at", encoding="utf-8") as f:
+                f.write(lines)
+        except Exception:
+            with self._cond:
+                self.dropped += len(batch)
+            raise
+        # Counters are only ever changed under _cond, which record() also holds.
+        with self._cond:
+            self.written += len(batch)
+        return len(batch)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self._safe_flush()
+
+    def _safe_flush(self):
+        # Disk full, EIO, permissions: the batch is lost and counted, the flusher stays alive.
+        try:
+            if self.flush():
+                self.last_error = None
+        except Exception as e:
+            if self.last_error is None:
+                print(f"audit log: write to {self.path} failed: {type(e).__name__}: {e}", file=sys.stderr)
+            with self._cond:
+                self.write_errors += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="audit-log", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+        return self
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._safe_flush()
+
+    def stats(self):
+        with self._cond:
+            return {"buffered": self._size, "written": self.written, "waits": self.waits, "dropped": self.dropped,
+                    "write_errors": self.write_errors, "last_error": self.last_error}
+
+
+def _inflate(view, pos, chunk=1 << 16):
+    """(bytes, end offset) of the gzip member starting at `pos`, or (None, None) if it is damaged.
+
+    Fed in fixed-size slices of a memoryview, so neither the input nor
+    `unused_data` ever copies the rest of the file.
+    """
+    d = zlib.decompressobj(wbits=31)
+    out, end = [], pos
+    try:
+        while not d.eof and end < len(view):
+            stop = min(end + chunk, len(view))
+            out.append(d.decompress(view[end:stop]))
+            end = stop
+    except zlib.error:
+        return None, None
+    if not d.eof:
+        return None, None
+    return b"".join(out), end - len(d.unused_data)
+
+
+def _members(data):
+    """(decompressed bytes or None, start offset) per gzip member; None marks a damaged member."""
+    view = memoryview(data)
+    pos = 0
+    while pos < len(data):
+        out, end = _inflate(view, pos)
+        if out is not None:
+            yield out, pos
+            pos = end
+            continue
+        # Cut short by a crash (or corrupted): resume at the next member header, if any.
+        yield None, pos
+        nxt = data.find(GZIP_MAGIC, pos + 1)
+        while nxt != -1:
+            try:
+                probe = zlib.decompressobj(wbits=31)
+                probe.decompress(data[nxt:nxt + 64])
+                break
+            except zlib.error:  # magic bytes inside compressed data, not a header
+                nxt = data.find(GZIP_MAGIC, nxt + 1)
+        pos = len(data) if nxt == -1 else nxt
+
+
+def read_audit_log(paths=None):
+    """Replay the log files into one DataFrame, oldest first.
+
+    A damaged batch (e.g. cut short by a crash) is skipped on its own; the
+    batches after it are still read. The counts of skipped batches and
+    unparseable lines are in `df.attrs`.
+    """
+    if paths is None:
+        paths = sorted(glob.glob(AUDIT_PATH.replace("{pid}", "*")))
+    elif isinstance(paths, str):
+        paths = [paths]
+    rows, skipped_batches, skipped_lines = [], 0, 0
+    for path in paths:
+        with open(path, "rb") as f:
+            data = f.read()
+        for member, _ in _members(data):
+            if member is None:
+                skipped_batches += 1
+                continue
+            for line in member.decode("utf-8", errors="replace").splitlines():
+                try:
+                    rows.append(json.loads(line))
+                except json.JSONDecodeError:
+                    skipped_lines += 1
+    df = pd.DataFrame(rows)
+    if len(df):
+        df["ts"] = pd.to_datetime(df["ts"], unit="s", utc=True)
+        df = df.sort_values("ts", kind="stable").reset_index(drop=True)
+    df.attrs.update(files=len(paths), skipped_batches=skipped_batches, skipped_lines=skipped_lines)
+    return df
+
+
+# ----------------- CLI -----------------
+def main():
+    parser = argparse.ArgumentParser(description="Replay the churn-score audit log.")
+    parser.add_argument("paths", nargs="*", help="log files (default: every audit_log.*.jsonl.gz)")
+    parser.add_argument("--out", help="write the replayed log to this CSV")
+    args = parser.parse_args()
+
+    df = read_audit_log(args.paths or None)
+    if df.attrs["skipped_batches"] or df.attrs["skipped_lines"]:
+        print(f"Skipped {df.attrs['skipped_batches']} damaged batches and {df.attrs['skipped_lines']} "
+              f"unparseable lines", file=sys.stderr)
+    if args.out:
+        df.to_csv(args.out, index=False)
+        print(f"Wrote {len(df)} audit records to {args.out}")
+        return
+    if df.empty:
+        print("Audit log is empty.")
+        return
+    print(f"{len(df)} scores from {df['ts'].min()} to {df['ts'].max()}")
+    print(df.groupby(["model_version", "risk_band"]).size().unstack(fill_value=0).to_string())
+
+
+if __name__ == "__main__":
+    main()
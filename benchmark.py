@@ -0,0 +1,277 @@
+# benchmark.py - Time every pipeline stage on synthetic customers and track regressions
+#
+#   python benchmark.py --sizes 1000,100000           # quick run
+#   python benchmark.py                                # 1k, 100k, 1M and 10M rows
+#   python benchmark.py --sizes 1000 --threads 1,2,4,8  # plus scoring-pool throughput curves
+#
+# The golden-set parity check (parity.py) runs first and must pass.
+# Every batch timing is the fastest of --repeats runs, which drops one-off
+# stalls (GC, page faults, other processes). Results are appended to
+# benchmark_history.json. Each timing is compared with the median of the same
+# timing over the last --baseline-runs passing runs on this host; anything
+# slower than --tolerance marks the run failed in the history (so it never
+# becomes a baseline) and exits with code 1.
+import argparse
+import json
+import multiprocessing
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from churn_pipeline import (
+    CATEGORICAL_COLS, DATA_PATH, FEATURE_COLUMNS, MODEL_PATH, NUMERIC_COLS, coded_pipeline, float32_pipeline,
+    load_pipeline, read_customers, to_float32, transformed_nbytes, warm_up,
+)
+from parity import print_report, run_parity
+from scoring_service import ScoringPool, single_threaded
+
+HISTORY_PATH = "benchmark_history.json"
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000, 10_000_000]
+
+
+# ----------------- Synthetic Data -----------------
+def synthetic_customers(n, seed=0, source=None):
+    """n customers whose per-column marginals follow netflix_churn.csv.
+
+    Categoricals are drawn with their observed frequencies; numerics through
+    the empirical quantile function, so ranges and skew carry over. Integer
+    columns stay integral.
+    """
+    source = read_customers(DATA_PATH) if source is None else source
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for col in CATEGORICAL_COLS:
+        freq = source[col].value_counts(normalize=True)
+        columns[col] = pd.Categorical.from_codes(
+            rng.choice(len(freq), size=n, p=freq.to_numpy()), categories=freq.index
+        ).astype(object)
+    for col in NUMERIC_COLS:
+        values = source[col].dropna().to_numpy(dtype=float)
+        sample = np.quantile(values, rng.random(n))
+        if np.all(values == np.round(values)):
+            sample = np.round(sample).astype(np.int64)
+        columns[col] = sample
+    return pd.DataFrame(columns)[FEATURE_COLUMNS]
+
+
+# ----------------- Timing -----------------
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def time_stages(pipeline, X, repeats=3):
+    """Seconds per pipeline stage, the model call, and end-to-end predict_proba; fastest of `repeats`."""
+    runs = []
+    for _ in range(repeats):
+        timings = {}
+        Xt = X
+        for name, step in pipeline.steps[:-1]:
+            Xt, timings[f"stage:{name}"] = _timed(step.transform, Xt)
+        _, timings["stage:model"] = _timed(pipeline.steps[-1][1].predict_proba, Xt)
+        _, timings["predict_proba"] = _timed(pipeline.predict_proba, X)
+        runs.append(timings)
+    return {metric: min(run[metric] for run in runs) for metric in runs[0]}
+
+
+def transformed_memory(pipeline, X):
+    """MB of the matrix the preprocessing hands to the model, per input / categorical layout."""
+    coded = coded_pipeline(pipeline)
+    layouts = {
+        "dense": (pipeline, X),
+        "float32": (float32_pipeline(pipeline), to_float32(X)),
+        "coded": (coded, X),
+        "coded_float32": (coded, to_float32(X)),
+    }
+    return {f"mb:{name}": transformed_nbytes(p, x) / 2**20 for name, (p, x) in layouts.items()}
+
+
+def time_single_row(pipeline, X, repeats=200):
+    """Latency percentiles of 1-row predict_proba calls, as the apps' predict_churn makes them."""
+    rows = [X.iloc[[i % len(X)]] for i in range(repeats)]
+    pipeline.predict_proba(rows[0])
+    latencies = []
+    for row in rows:
+        start = time.perf_counter()
+        pipeline.predict_proba(row)[:, 1][0]
+        latencies.append(time.perf_counter() - start)
+    return {
+        "single_row_p50": float(np.percentile(latencies, 50)),
+        "single_row_p95": float(np.percentile(latencies, 95)),
+    }
+
+
+def _first_request(model_path, warm, row, queue):
+    pipeline = load_pipeline(model_path)
+    warmup_seconds = _timed(warm_up, pipeline)[1] if warm else 0.0
+    first = _timed(pipeline.predict_proba, row)[1]
+    steady = np.median([_timed(pipeline.predict_proba, row)[1] for _ in range(20)])
+    queue.put((warmup_seconds, first, steady))
+
+
+def cold_start(model_path, row, runs=3):
+    """First 1-row request latency in fresh processes, straight after load and after warm_up().
+
+    Medians over `runs` processes; `warm_up` is what the warm-up itself costs
+    at load time and `steady_request` the latency once everything is primed.
+    """
+    # Plain (non-daemon) processes, so the forest keeps its own n_jobs behaviour as in the apps.
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    medians = {}
+    for label, warm in (("cold", False), ("warm", True)):
+        measured = []
+        for _ in range(runs):
+            proc = ctx.Process(target=_first_request, args=(model_path, warm, row, queue))
+            proc.start()
+            measured.append(queue.get())
+            proc.join()
+        medians[label] = np.median(measured, axis=0)
+    return {
+        "cold_first_request": float(medians["cold"][1]),
+        "warm_first_request": float(medians["warm"][1]),
+        "warm_up": float(medians["warm"][0]),
+        "steady_request": float(medians["warm"][2]),
+    }
+
+
+def thread_curve(pipeline, X, threads, batch_rows=100, batches=200, repeats=3):
+    """Seconds to score `batches` requests of `batch_rows` rows on a ScoringPool of each size.
+
+    Mirrors the scoring service: one shared single-threaded model, every
+    request admitted up front (no 503s), wall time until the last finishes.
+    Fastest of `repeats` per pool size.
+    """
+    model = single_threaded(pipeline)
+    requests = [X.iloc[(i * batch_rows) % len(X):][:batch_rows] for i in range(batches)]
+    model.predict_proba(requests[0])
+    timings = {}
+    for n in threads:
+        pool = ScoringPool(n, queue_size=batches)
+        walls = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            for future in [pool.submit(model.predict_proba, r) for r in requests]:
+                future.result()
+            walls.append(time.perf_counter() - start)
+        timings[f"threads={n}"] = min(walls)
+        pool.shutdown()
+    return timings
+
+
+# ----------------- History -----------------
+def load_history(path=HISTORY_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+
+def find_regressions(history, run, tolerance, baseline_runs=5):
+    """(size, metric, baseline, current) for timings slower than their baseline on this host.
+
+    The baseline is the median over the last `baseline_runs` passing runs on
+    the host, so one lucky or unlucky run doesn't move it.
+    """
+    # Runs written before the "passed" flag existed count as passing.
+    passing = [r for r in history if r["host"] == run["host"] and r.get("passed", True)][-baseline_runs:]
+    regressions = []
+    for size, timings in run["results"].items():
+        for metric, seconds in timings.items():
+            previous = [r["results"][size][metric] for r in passing if metric in r["results"].get(size, {})]
+            before = float(np.median(previous)) if previous else None
+            if before and seconds > before * (1 + tolerance):
+                regressions.append((size, metric, before, seconds))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the churn pipeline on synthetic data.")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated row counts")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown vs the baseline (0.2 = 20%%)")
+    parser.add_argument("--repeats", type=int, default=3, help="runs per batch timing; the fastest is kept")
+    parser.add_argument("--baseline-runs", type=int, default=5,
+                        help="passing runs on this host whose median is the baseline")
+    parser.add_argument("--history", default=HISTORY_PATH)
+    parser.add_argument("--label", default="", help="free-text note stored with the run")
+    parser.add_argument("--skip-parity", action="store_true", help="do not gate on the golden-set parity check")
+    parser.add_argument("--cold-start", action="store_true",
+                        help="first-request latency in fresh processes, with and without warm-up")
+    parser.add_argument("--memory", action="store_true",
+                        help="size of the transformed matrix with one-hot vs integer-coded categoricals")
+    parser.add_argument("--threads", default="", help="comma-separated pool sizes for throughput curves, e.g. 1,2,4,8")
+    parser.add_argument("--batch-rows", default="1,100", help="rows per request in the thread curves")
+    args = parser.parse_args()
+
+    pipeline = load_pipeline(args.model)
+    # Timings only count for backends that still give the reference answers.
+    if not args.skip_parity and not print_report(run_parity(pipeline, model_path=args.model)):
+        print("Golden-set parity failed; not benchmarking.", file=sys.stderr)
+        sys.exit(1)
+    source = read_customers(DATA_PATH)
+    results = {}
+    for size in [int(s) for s in args.sizes.split(",")]:
+        X = synthetic_customers(size, source=source)
+        timings = time_stages(pipeline, X, args.repeats)
+        timings["rows_per_sec"] = size / timings["predict_proba"]
+        results[str(size)] = timings
+        print(f"{size:>10,} rows: " + ", ".join(
+            f"{k}={v:.4f}" for k, v in timings.items() if k != "rows_per_sec"
+        ) + f", {timings['rows_per_sec']:,.0f} rows/s")
+        if args.memory:
+            memory = transformed_memory(pipeline, X)
+            timings.update(memory)
+            print(f"{'':>10}  transformed matrix: " + ", ".join(f"{k[3:]}={v:,.1f} MB" for k, v in memory.items()))
+    results["single_row"] = time_single_row(pipeline, source)
+    print("single row: " + ", ".join(f"{k}={v * 1000:.2f}ms" for k, v in results["single_row"].items()))
+    if args.cold_start:
+        results["cold_start"] = cold_start(args.model, source.iloc[[0]])
+        print("first request: " + ", ".join(f"{k}={v * 1000:.2f}ms" for k, v in results["cold_start"].items()))
+    if args.threads:
+        threads = [int(t) for t in args.threads.split(",")]
+        for batch_rows in [int(b) for b in args.batch_rows.split(",")]:
+            batches = 200
+            curve = thread_curve(pipeline, source, threads, batch_rows, batches, args.repeats)
+            results[f"pool:batch={batch_rows}"] = curve
+            base = curve[f"threads={threads[0]}"]
+            print(f"pool, {batch_rows} rows/request: " + ", ".join(
+                f"{k} {batch_rows * batches / v:,.0f} rows/s (x{base / v:.2f})" for k, v in curve.items()
+            ))
+
+    run = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "label": args.label,
+        "results": results,
+    }
+    # rows_per_sec grows when things get faster, and mb: entries are sizes, so neither is compared as a timing.
+    comparable = {**run, "results": {
+        size: {k: v for k, v in t.items() if k != "rows_per_sec" and not k.startswith("mb:")}
+        for size, t in results.items()
+    }}
+    history = load_history(args.history)
+    regressions = find_regressions(history, comparable, args.tolerance, args.baseline_runs)
+    run["passed"] = not regressions
+    history.append(run)
+    with open(args.history, "w") as f:
+        json.dump(history, f, indent=2)
+
+    if regressions:
+        print(f"\nPERFORMANCE REGRESSION (> {args.tolerance:.0%} slower than the median of the last "
+              f"{args.baseline_runs} passing runs; stored as failed):", file=sys.stderr)
+        for size, metric, before, after in regressions:
+            print(f"  {size:>10} {metric}: {before:.4f}s -> {after:.4f}s ({after / before - 1:+.0%})", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
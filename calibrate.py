@@ -0,0 +1,117 @@
+# calibrate.py - Choose the risk-band cut-offs from precision / recall on labelled data
+#
+# The file is scored once. Sorting the probabilities high to low turns "flag
+# everyone with prob >= t" into a prefix of the sorted rows, so cumulative sums
+# of the labels give true / false positives for every distinct score at once -
+# no loop over candidate thresholds. The chosen cut-offs go to
+# risk_thresholds.json, which churn_pipeline reads for every app, risk_band()
+# (score_batch.py, scoring_service.py) and insights.py.
+#
+# Scores on netflix_churn.csv are in-sample for the shipped model and look
+# better than live ones; pass a held-out file when there is one.
+#
+#   python calibrate.py                                         # prints the curve summary, writes risk_thresholds.json
+#   python calibrate.py holdout.csv --high-precision 0.95 --moderate-recall 0.8
+#   python calibrate.py --dry-run                               # compare with the current cut-offs only
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from churn_pipeline import DATA_PATH, MODEL_PATH, THRESHOLDS, THRESHOLDS_PATH, load_pipeline, read_customers
+from model_registry import file_version
+from prob_calibration import calibrated
+
+TARGET = "churned"
+
+
+# ----------------- Threshold Curve -----------------
+def threshold_curve(prob, y):
+    """Precision / recall / F1 / share flagged of `prob >= t` for every distinct score t, highest t first."""
+    order = np.argsort(-prob, kind="stable")
+    p, y = prob[order], np.asarray(y)[order]
+    tp, fp = np.cumsum(y), np.cumsum(1 - y)
+    # Last row of each run of equal scores: flagging prob >= t takes every row up to it.
+    last = np.r_[np.flatnonzero(np.diff(p)), len(p) - 1]
+    tp, fp, positives = tp[last], fp[last], y.sum()
+    return pd.DataFrame({
+        "threshold": p[last],
+        "precision": tp / (tp + fp),
+        "recall": tp / max(positives, 1),
+        "f1": 2 * tp / (tp + fp + positives),
+        "flagged": (tp + fp) / len(p),
+    })
+
+
+def metrics_at(curve, thresholds):
+    """Curve rows for arbitrary cut-offs (the lowest score still >= each cut-off)."""
+    ascending = curve["threshold"].to_numpy()[::-1]
+    idx = len(curve) - np.searchsorted(ascending, np.asarray(thresholds, dtype=float), side="left") - 1
+    rows = curve.iloc[np.maximum(idx, 0)].reset_index(drop=True)
+    rows.loc[idx < 0, ["precision", "recall", "f1", "flagged"]] = [np.nan, 0.0, 0.0, 0.0]  # nobody flagged
+    return rows.assign(threshold=np.asarray(thresholds, dtype=float))
+
+
+def choose_thresholds(curve, high_precision=0.9, moderate_recall=0.9):
+    """churn: best F1; high: lowest cut-off with precision >= target; moderate: highest with recall >= target."""
+    precise = curve[curve["precision"] >= high_precision]
+    covering = curve[curve["recall"] >= moderate_recall]
+    high = precise["threshold"].min() if len(precise) else curve["threshold"].max()
+    moderate = covering["threshold"].max() if len(covering) else curve["threshold"].min()
+    return {
+        "churn": float(curve["threshold"].iloc[curve["f1"].to_numpy().argmax()]),
+        "moderate": float(min(moderate, high)),
+        "high": float(high),
+    }
+
+
+# ----------------- CLI -----------------
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate the risk-band cut-offs.")
+    parser.add_argument("data", nargs="?", default=DATA_PATH, help=f"labelled CSV (needs '{TARGET}')")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--high-precision", type=float, default=0.9, help="precision required of the High band")
+    parser.add_argument("--moderate-recall", type=float, default=0.9,
+                        help="share of churners that must land in Moderate or High")
+    parser.add_argument("--out", default=THRESHOLDS_PATH)
+    parser.add_argument("--dry-run", action="store_true", help="print only, don't write the config")
+    args = parser.parse_args()
+
+    y = pd.read_csv(args.data, usecols=[TARGET])[TARGET].to_numpy()
+    # Cut-offs apply to the probabilities the apps show, i.e. after prob_calibration.py.
+    prob = calibrated(load_pipeline(args.model), args.model).predict_proba(read_customers(args.data))[:, 1] * 100
+    start = time.perf_counter()
+    curve = threshold_curve(prob, y)
+    chosen = choose_thresholds(curve, args.high_precision, args.moderate_recall)
+    print(f"{len(curve)} candidate cut-offs from {len(prob)} rows in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    names = list(chosen)
+    table = pd.concat({
+        "current": metrics_at(curve, [THRESHOLDS[n] for n in names]).set_axis(names),
+        "chosen": metrics_at(curve, [chosen[n] for n in names]).set_axis(names),
+    })
+    print(table.to_string(float_format=lambda v: f"{v:.4f}"))
+    if args.dry_run:
+        return
+
+    metrics = metrics_at(curve, list(chosen.values())).set_axis(names)
+    config = {
+        **chosen,
+        "calibration": {
+            "data": args.data,
+            "rows": int(len(prob)),
+            "model_sha": file_version(args.model)[2],
+            "high_precision": args.high_precision,
+            "moderate_recall": args.moderate_recall,
+            "metrics": metrics.drop(columns="threshold").to_dict(orient="index"),
+        },
+    }
+    with open(args.out, "w") as f:
+        json.dump(config, f, indent=2)
+    print(f"Wrote {args.out}; apps pick it up on restart (re-run `python fast_path.py distill` if you use the fast path)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,437 @@
+# churn_pipeline.py - Shared pipeline pieces for the Netflix churn apps and tools
+#
+# NetflixChurn_pipeline.pkl was pickled from a script, so its custom steps are
+# referenced as __main__.MissingValueHandler etc. Importing the classes from
+# here into an app's namespace (or calling load_pipeline) keeps it loadable.
+import copy
+import json
+import os
+import sys
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, ClassifierMixin, TransformerMixin
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, StandardScaler
+
+from sketches import KLLSketch, ModeCounter
+
+MODEL_PATH = "NetflixChurn_pipeline.pkl"
+DATA_PATH = "netflix_churn.csv"
+
+NUMERIC_COLS = [
+    "age", "watch_hours", "last_login_days", "no_of_devices",
+    "avg_watch_time_per_day", "number_of_profiles",
+]
+CATEGORICAL_COLS = [
+    "gender", "subscription_type", "region", "device", "payment_method", "favorite_genre",
+]
+# The 12 inputs in the order the apps build their user_input DataFrame.
+FEATURE_COLUMNS = [
+    "age", "gender", "subscription_type", "watch_hours", "last_login_days",
+    "no_of_devices", "region", "device", "payment_method", "favorite_genre",
+    "avg_watch_time_per_day", "number_of_profiles",
+]
+
+# netflix_churn.csv has no device count; the apps default it to 1.
+INPUT_DEFAULTS = {"no_of_devices": 1}
+
+# Risk cut-offs in percent. "churn" is the single cut-off of the two-band apps
+# (app.py, app9.py), "moderate" / "high" split the three bands (appnew.py,
+# risk_band). calibrate.py writes them to risk_thresholds.json.
+THRESHOLDS_PATH = "risk_thresholds.json"
+DEFAULT_THRESHOLDS = {"churn": 65.0, "moderate": 50.0, "high": 75.0}
+
+
+def load_thresholds(path=THRESHOLDS_PATH):
+    thresholds = dict(DEFAULT_THRESHOLDS)
+    if os.path.exists(path):
+        with open(path) as f:
+            config = json.load(f)
+        thresholds.update({name: float(config[name]) for name in DEFAULT_THRESHOLDS if name in config})
+    return thresholds
+
+
+THRESHOLDS = load_thresholds()
+CHURN_THRESHOLD = THRESHOLDS["churn"]
+HIGH_RISK_THRESHOLD = THRESHOLDS["high"]
+MODERATE_RISK_THRESHOLD = THRESHOLDS["moderate"]
+# Every cut-off used by an app variant, ascending.
+CUTOFFS = tuple(sorted(set(THRESHOLDS.values())))
+
+
+# ----------------- Pipeline Helper Classes -----------------
+class MissingValueHandler(BaseEstimator, TransformerMixin):
+    def __init__(self, numeric_cols, categorical_cols):
+        self.numeric_cols = numeric_cols
+        self.categorical_cols = categorical_cols
+
+    def fit(self, X, y=None):
+        self.num_median = X[self.numeric_cols].median()
+        self.cat_mode = X[self.categorical_cols].mode().iloc[0]
+        return self
+
+    def partial_fit(self, X, y=None):
+        """Streaming fit: medians from KLL sketches, modes from exact counters."""
+        if not hasattr(self, "num_sketches_"):
+            self.num_sketches_ = {col: KLLSketch() for col in self.numeric_cols}
+            self.cat_counters_ = {col: ModeCounter() for col in self.categorical_cols}
+        for col in self.numeric_cols:
+            self.num_sketches_[col].update(X[col])
+        for col in self.categorical_cols:
+            self.cat_counters_[col].update(X[col])
+        return self._finalize_sketches()
+
+    def merge(self, other):
+        """Combine with a handler partial-fitted on another shard."""
+        for col in self.numeric_cols:
+            self.num_sketches_[col].merge(other.num_sketches_[col])
+        for col in self.categorical_cols:
+            self.cat_counters_[col].merge(other.cat_counters_[col])
+        return self._finalize_sketches()
+
+    def _finalize_sketches(self):
+        self.num_median = pd.Series({c: self.num_sketches_[c].quantile(0.5) for c in self.numeric_cols})
+        self.cat_mode = pd.Series({c: self.cat_counters_[c].mode() for c in self.categorical_cols})
+        return self
+
+    def transform(self, X):
+        X = X.copy()
+        X[self.numeric_cols] = X[self.numeric_cols].fillna(self.num_median)
+        X[self.categorical_cols] = X[self.categorical_cols].fillna(self.cat_mode)
+        return X
+
+
+class OutlierClipper(BaseEstimator, TransformerMixin):
+    def __init__(self, cols, lower=0.01, upper=0.99):
+        self.cols = cols
+        self.lower = lower
+        self.upper = upper
+
+    def fit(self, X, y=None):
+        self.bounds = {}
+        for col in self.cols:
+            self.bounds[col] = (
+                np.quantile(X[col], self.lower),
+                np.quantile(X[col], self.upper)
+            )
+        return self
+
+    def partial_fit(self, X, y=None):
+        """Streaming fit: clip bounds from KLL sketches (see sketches.py for error bounds)."""
+        if not hasattr(self, "sketches_"):
+            self.sketches_ = {col: KLLSketch() for col in self.cols}
+        for col in self.cols:
+            self.sketches_[col].update(X[col])
+        return self._finalize_sketches()
+
+    def merge(self, other):
+        """Combine with a clipper partial-fitted on another shard."""
+        for col in self.cols:
+            self.sketches_[col].merge(other.sketches_[col])
+        return self._finalize_sketches()
+
+    def _finalize_sketches(self):
+        self.bounds = {}
+        for col in self.cols:
+            low, high = self.sketches_[col].quantile([self.lower, self.upper])
+            self.bounds[col] = (low, high)
+        return self
+
+    def transform(self, X):
+        X = X.copy()
+        for col in self.cols:
+            low, high = self.bounds[col]
+            if X[col].dtype == np.float32:
+                low, high = np.float32(low), np.float32(high)
+            X[col] = np.clip(X[col], low, high)
+        return X
+
+
+class FeatureEngineer(BaseEstimator, TransformerMixin):
+    def fit(self, X, y=None):
+        return self
+
+    def transform(self, X):
+        X = X.copy()
+        # int8 so a float32 frame is not upcast when the numeric block is stacked.
+        X["inactive_flag"] = (X["last_login_days"] > 30).astype(np.int8)
+        X["engagement_ratio"] = X["watch_hours"] / (X["last_login_days"] + 1)
+        return X
+
+
+class FeatureBinner(BaseEstimator, TransformerMixin):
+    """Small-integer codes for a histogram model: numerics -> bin index, categoricals -> level index.
+
+    Bin i holds cuts[i-1] < v <= cuts[i], compared in float32 like sklearn's
+    tree splits, so float32 and float64 inputs get the same codes. Missing
+    numerics and unseen levels become NaN, which HistGradientBoostingClassifier
+    routes as missing. The cuts can be set from sketches (train_hgb.py) instead
+    of calling fit().
+    """
+
+    def __init__(self, numeric_cols, categorical_cols, max_bins=255):
+        self.numeric_cols = numeric_cols
+        self.categorical_cols = categorical_cols
+        self.max_bins = max_bins
+
+    def fit(self, X, y=None):
+        qs = np.linspace(0, 1, self.max_bins)[1:-1]
+        self.cuts_ = {col: np.unique(np.nanquantile(X[col].astype(float), qs)) for col in self.numeric_cols}
+        self.levels_ = {col: sorted(X[col].dropna().unique()) for col in self.categorical_cols}
+        return self
+
+    def transform(self, X):
+        out = np.empty((len(X), len(self.numeric_cols) + len(self.categorical_cols)), dtype=np.float32)
+        for i, col in enumerate(self.numeric_cols):
+            values = X[col].to_numpy(dtype=np.float32)
+            cuts = self.cuts_[col].astype(np.float32)
+            out[:, i] = np.where(np.isnan(values), np.nan, np.searchsorted(cuts, values, side="left"))
+        for i, col in enumerate(self.categorical_cols, start=len(self.numeric_cols)):
+            codes = pd.Categorical(X[col], categories=self.levels_[col]).codes
+            out[:, i] = np.where(codes < 0, np.nan, codes)
+        return out
+
+    def get_feature_names_out(self, input_features=None):
+        return np.asarray(list(self.numeric_cols) + list(self.categorical_cols), dtype=object)
+
+
+# ----------------- Loading -----------------
+def load_pipeline(path=MODEL_PATH, mmap_mode=None):
+    main = sys.modules["__main__"]
+    for cls in (MissingValueHandler, OutlierClipper, FeatureEngineer):
+        if not hasattr(main, cls.__name__):
+            setattr(main, cls.__name__, cls)
+    return joblib.load(path, mmap_mode=mmap_mode)
+
+
+def read_customers(path=DATA_PATH, **kwargs):
+    """Read customer rows and return them with the 12 model inputs."""
+    df = pd.read_csv(path, **kwargs)
+    return feature_frame(df)
+
+
+def feature_frame(df):
+    df = df.copy()
+    for col, value in INPUT_DEFAULTS.items():
+        if col not in df:
+            df[col] = value
+    return df[FEATURE_COLUMNS]
+
+
+def records_frame(records):
+    """Input dicts as a model-ready frame, numerics typed as numbers (None -> NaN)."""
+    X = feature_frame(pd.DataFrame.from_records(records))
+    X[NUMERIC_COLS] = X[NUMERIC_COLS].apply(pd.to_numeric, errors="coerce")
+    return X
+
+
+def risk_band(prob):
+    """Vectorized risk band for probabilities in percent."""
+    return np.select(
+        [np.asarray(prob) >= HIGH_RISK_THRESHOLD, np.asarray(prob) >= MODERATE_RISK_THRESHOLD],
+        ["High", "Moderate"],
+        "Low",
+    )
+
+
+def cutoff_band(prob):
+    """Number of CUTOFFS at or below each probability (percent).
+
+    Finer than risk_band(): two scores get the same value only when every app
+    variant, the two-band ones at the churn cut-off included, shows them alike.
+    """
+    return np.searchsorted(CUTOFFS, prob, side="right")
+
+
+# ----------------- Float32 Inference -----------------
+def to_float32(X):
+    """Cast the numeric inputs to float32; categoricals are left as they are."""
+    X = X.copy()
+    X[NUMERIC_COLS] = X[NUMERIC_COLS].astype(np.float32)
+    return X
+
+
+def _set_encoder_dtype(est, dtype):
+    if isinstance(est, OneHotEncoder):
+        est.dtype = dtype
+    elif isinstance(est, ColumnTransformer):
+        for _, trans, _ in est.transformers_:
+            _set_encoder_dtype(trans, dtype)
+    elif isinstance(est, Pipeline):
+        for _, step in est.steps:
+            _set_encoder_dtype(step, dtype)
+
+
+def float32_pipeline(pipeline):
+    """Copy of a fitted pipeline whose preprocessing emits float32.
+
+    Only the (small) preprocessing steps are copied; the model is shared.
+    Tree ensembles cast their input to float32 internally anyway, so feeding
+    float32 skips that conversion as well as halving the transformed matrix.
+    """
+    steps = [(name, copy.deepcopy(step)) for name, step in pipeline.steps[:-1]]
+    for _, step in steps:
+        _set_encoder_dtype(step, np.float32)
+    return Pipeline(steps + [pipeline.steps[-1]])
+
+
+# ----------------- Coded Categoricals -----------------
+class OneHotExpander(ClassifierMixin, BaseEstimator):
+    """A model fitted on one-hot columns, fed one integer code per categorical instead.
+
+    Codes are level indices (-1 for a level the encoder never saw, which
+    one-hot encodes as all zeros). They are expanded back into the layout the
+    model was fitted on `chunksize` rows at a time, so the full one-hot matrix
+    never exists. The slab is float32, which is what tree models split on
+    anyway, so their answers are unchanged.
+    """
+
+    @classmethod
+    def wrap(cls, model, dense_from, dense_to, code_cols, offsets, n_features, chunksize=50_000):
+        self = cls()
+        self.model = model
+        self.dense_from, self.dense_to = np.asarray(dense_from, dtype=np.intp), np.asarray(dense_to, dtype=np.intp)
+        self.code_cols, self.offsets = np.asarray(code_cols, dtype=np.intp), np.asarray(offsets, dtype=np.intp)
+        self.n_features = n_features
+        self.chunksize = chunksize
+        self.classes_ = model.classes_
+        return self
+
+    def fit(self, X=None, y=None):
+        # Wraps an already fitted model; fit() only lets sklearn treat it as an estimator.
+        return self
+
+    def expand(self, X):
+        """The one-hot float32 matrix the wrapped model expects for a block of coded rows."""
+        out = np.zeros((len(X), self.n_features), dtype=np.float32)
+        out[:, self.dense_to] = X[:, self.dense_from]
+        codes = X[:, self.code_cols].astype(np.intp)
+        rows, cats = np.nonzero(codes >= 0)
+        out[rows, self.offsets[cats] + codes[rows, cats]] = 1
+        return out
+
+    def predict_proba(self, X):
+        X = np.asarray(X)
+        return np.concatenate([self.model.predict_proba(self.expand(X[start:start + self.chunksize]))
+                               for start in range(0, len(X), self.chunksize)])
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+def coded_pipeline(pipeline, chunksize=50_000):
+    """Copy of a fitted pipeline whose preprocessing emits integer codes instead of one-hot blocks.
+
+    Each OneHotEncoder in the preprocessing ColumnTransformer is swapped for an
+    OrdinalEncoder over the same categories and the model is wrapped in a
+    OneHotExpander. The transformed matrix drops from one column per level to
+    one per categorical (37 -> 14 columns for the shipped model). Pipelines
+    without a one-hot block (the binned HGB one) are coded already and come
+    back unchanged.
+    """
+    steps = [(name, copy.deepcopy(step)) for name, step in pipeline.steps[:-1]]
+    encoded = [step for _, step in steps if isinstance(step, ColumnTransformer)
+               and any(isinstance(trans, OneHotEncoder) for _, trans, _ in step.transformers_)]
+    if not encoded:
+        return pipeline
+    ct = encoded[0]
+    dense_from, dense_to, code_cols, offsets, width = [], [], [], [], 0
+    for i, (label, trans, cols) in enumerate(ct.transformers_):
+        block = ct.output_indices_[label]
+        if not isinstance(trans, OneHotEncoder):
+            dense_from += range(width, width + block.stop - block.start)
+            dense_to += range(block.start, block.stop)
+            width += block.stop - block.start
+            continue
+        if trans.drop is not None or trans.min_frequency is not None or trans.max_categories is not None:
+            raise ValueError(f"can't code {label!r}: dropped or grouped levels break the one-hot layout")
+        codes = OrdinalEncoder(categories=[list(cats) for cats in trans.categories_], dtype=np.float32,
+                               handle_unknown="use_encoded_value", unknown_value=-1)
+        codes.fit(pd.DataFrame({col: cats[:1] for col, cats in zip(cols, trans.categories_)}))
+        ct.transformers_[i] = (label, codes, cols)
+        offsets += list(block.start + np.cumsum([0] + [len(cats) for cats in trans.categories_[:-1]]))
+        code_cols += range(width, width + len(cols))
+        width += len(cols)
+    ct.sparse_output_ = False
+    n_features = max(block.stop for block in ct.output_indices_.values())
+    name, model = pipeline.steps[-1]
+    return Pipeline(steps + [(name, OneHotExpander.wrap(model, dense_from, dense_to, code_cols, offsets,
+                                                        n_features, chunksize))])
+
+
+def transformed_nbytes(pipeline, X):
+    """Bytes of the matrix the preprocessing steps hand to the model (dense or sparse)."""
+    Xt = Pipeline(pipeline.steps[:-1]).transform(X)
+    if hasattr(Xt, "indptr"):
+        return Xt.data.nbytes + Xt.indices.nbytes + Xt.indptr.nbytes
+    return np.asarray(Xt).nbytes
+
+
+# ----------------- Warm-up -----------------
+def _fitted_columns(pipeline, kind):
+    # (columns, fitted transformer) pairs of one type inside the preprocessing ColumnTransformer.
+    for _, step in pipeline.steps[:-1]:
+        if isinstance(step, ColumnTransformer):
+            return [(cols, trans) for _, trans, cols in step.transformers_ if isinstance(trans, kind)]
+    return []
+
+
+def warmup_frame(pipeline, rows=64):
+    """Synthetic inputs that hit every categorical level the model was fitted on.
+
+    Categorical columns cycle through the encoder's (or binner's) categories;
+    numerics sweep +-2 standard deviations around the scaler's means, each column
+    shifted differently so rows land in many different leaves.
+    """
+    levels = {col: list(cats) for cols, enc in _fitted_columns(pipeline, OneHotEncoder)
+              for col, cats in zip(cols, enc.categories_)}
+    scaled = {col: (mean, scale) for cols, scaler in _fitted_columns(pipeline, StandardScaler)
+              for col, mean, scale in zip(cols, scaler.mean_, scaler.scale_)}
+    for _, step in pipeline.steps[:-1]:
+        if isinstance(step, FeatureBinner):
+            # Binned pipelines: levels as stored, numerics centred on the median cut.
+            levels.update({col: list(cats) for col, cats in step.levels_.items() if len(cats)})
+            scaled.update({col: (np.median(cuts), (cuts[-1] - cuts[0]) / 4)
+                           for col, cuts in step.cuts_.items() if len(cuts)})
+    rows = max([rows] + [len(cats) for cats in levels.values()])
+    spread = np.linspace(-2, 2, rows)
+    X = {}
+    for i, col in enumerate(CATEGORICAL_COLS):
+        cats = levels.get(col, ["Unknown"])
+        X[col] = [cats[(r + i) % len(cats)] for r in range(rows)]
+    for i, col in enumerate(NUMERIC_COLS):
+        mean, scale = scaled.get(col, (1.0, 0.0))
+        X[col] = np.clip(mean + scale * np.roll(spread, 7 * i), 0, None)
+    return pd.DataFrame(X)[FEATURE_COLUMNS]
+
+
+def warm_up(pipeline, rows=64):
+    """Pay the first-call costs before a user does: one batch, then the apps' 1-row shape."""
+    X = warmup_frame(pipeline, rows)
+    pipeline.predict_proba(X)
+    for i in range(3):
+        pipeline.predict_proba(X.iloc[[i]])
+    return X
+
+
+# ----------------- Streaming Fit Check -----------------
+if __name__ == "__main__":
+    df = read_customers()
+    exact_mvh = MissingValueHandler(NUMERIC_COLS, CATEGORICAL_COLS).fit(df)
+    exact_clip = OutlierClipper(["watch_hours", "avg_watch_time_per_day"]).fit(df)
+
+    shards = [df.iloc[i::4] for i in range(4)]
+    streamed_mvh = MissingValueHandler(NUMERIC_COLS, CATEGORICAL_COLS).partial_fit(shards[0])
+    streamed_clip = OutlierClipper(["watch_hours", "avg_watch_time_per_day"]).partial_fit(shards[0])
+    for shard in shards[1:]:
+        streamed_mvh.merge(MissingValueHandler(NUMERIC_COLS, CATEGORICAL_COLS).partial_fit(shard))
+        streamed_clip.merge(OutlierClipper(["watch_hours", "avg_watch_time_per_day"]).partial_fit(shard))
+
+    print(pd.DataFrame({"exact": exact_mvh.num_median, "streamed": streamed_mvh.num_median}))
+    print(pd.DataFrame({"exact": exact_mvh.cat_mode, "streamed": streamed_mvh.cat_mode}))
+    for col, (low, high) in exact_clip.bounds.items():
+        s_low, s_high = streamed_clip.bounds[col]
+        print(f"{col}: exact ({low:.3f}, {high:.3f}) streamed ({s_low:.3f}, {s_high:.3f})")
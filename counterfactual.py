@@ -0,0 +1,162 @@
+# counterfactual.py - Cheapest changes that move a customer under the risk cut-off
+#
+# EDITS lists the actionable changes (plan upgrade, payment method, more watch
+# time, ...) as DataFrame.eval() predicates and assignments with a relative
+# cost. search() runs a beam search over combinations of edits: every step
+# expands all beam states by every applicable edit into one candidate frame,
+# scores it with a single predict_proba call, keeps the candidates that are
+# already under the cut-off, and carries the `beam_width` lowest-scoring others
+# into the next step. Edits touch different fields, so a combination is
+# identified by its bit mask and duplicates are dropped before scoring.
+#
+#   python counterfactual.py '{"age": 30, "gender": "Male", "subscription_type": "Basic", ...}'
+#   python counterfactual.py --bench 200          # latency over high-risk customers of netflix_churn.csv
+import argparse
+import json
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from churn_pipeline import (
+    DATA_PATH, FEATURE_COLUMNS, MODEL_PATH, MODERATE_RISK_THRESHOLD, feature_frame, load_pipeline, records_frame,
+)
+from prob_calibration import calibrated
+
+Edit = namedtuple("Edit", ["code", "field", "cost", "when", "change", "action"])
+Suggestion = namedtuple("Suggestion", ["edits", "cost", "prob"])
+
+# Costs are relative effort / spend per edit; tune them with the retention team.
+EDITS = [
+    Edit("PLAN_STANDARD", "subscription_type", 1.0, "subscription_type == 'Basic'",
+         {"subscription_type": "'Standard'"}, "Upgrade Basic → Standard"),
+    Edit("PLAN_PREMIUM", "subscription_type", 2.0, "subscription_type in ['Basic', 'Standard']",
+         {"subscription_type": "'Premium'"}, "Upgrade to Premium"),
+    Edit("CARD_ON_FILE", "payment_method", 1.0, "payment_method in ['Gift Card', 'Crypto']",
+         {"payment_method": "'Credit Card'"}, "Move from gift card / crypto to card on file"),
+    Edit("WATCH_HALF_HOUR", "watch_hours", 1.0, "watch_hours <= 164.5",
+         {"watch_hours": "watch_hours + 3.5", "avg_watch_time_per_day": "avg_watch_time_per_day + 0.5"},
+         "Half an hour more viewing a day (personalized recommendations)"),
+    Edit("WATCH_HOUR", "watch_hours", 2.0, "watch_hours <= 161",
+         {"watch_hours": "watch_hours + 7", "avg_watch_time_per_day": "avg_watch_time_per_day + 1"},
+         "An hour more viewing a day (new-release campaign)"),
+    Edit("LOGIN_THIS_WEEK", "last_login_days", 1.0, "last_login_days > 7",
+         {"last_login_days": "7"}, "Bring them back this week (re-engagement push)"),
+    Edit("EXTRA_PROFILE", "number_of_profiles", 1.0, "number_of_profiles < 5",
+         {"number_of_profiles": "number_of_profiles + 1"}, "Add a profile (family / friend sharing)"),
+]
+EDIT_BITS = {edit.code: 1 << bit for bit, edit in enumerate(EDITS)}
+MIN_EDIT_COST = min(edit.cost for edit in EDITS)
+FIELD_BITS = {field: sum(EDIT_BITS[e.code] for e in EDITS if e.field == field) for field in {e.field for e in EDITS}}
+
+
+def _decode(codes):
+    return [edit for edit in EDITS if codes & EDIT_BITS[edit.code]]
+
+
+def search(pipeline, record, target=MODERATE_RISK_THRESHOLD, beam_width=8, max_edits=3, budget_ms=400, top=3):
+    """Up to `top` edit combinations that score under `target` (percent), cheapest first.
+
+    Returns (suggestions, stats). No step is started that would likely end past
+    `budget_ms`; the suggestions found by then are still returned.
+    """
+    start = time.perf_counter()
+    beam = records_frame([record]).assign(_codes=0, _cost=0.0)
+    found, scored, steps, step_ms = [], 0, 0, 0.0
+    for _ in range(max_edits):
+        # Don't start a step that would likely overrun: each costs about as much as the last.
+        if steps and (time.perf_counter() - start) * 1000 + step_ms > budget_ms:
+            break
+        step_start = time.perf_counter()
+        children = []
+        for edit in EDITS:
+            ok = (beam["_codes"].to_numpy() & FIELD_BITS[edit.field]) == 0
+            ok &= beam.eval(edit.when).fillna(False).to_numpy(dtype=bool)
+            if ok.any():
+                child = beam[ok].copy()
+                for col, expr in edit.change.items():
+                    child[col] = child.eval(expr)
+                child["_codes"] |= EDIT_BITS[edit.code]
+                child["_cost"] += edit.cost
+                children.append(child)
+        if not children:
+            break
+        candidates = pd.concat(children, ignore_index=True).drop_duplicates("_codes")
+        candidates["_prob"] = pipeline.predict_proba(candidates[FEATURE_COLUMNS])[:, 1] * 100
+        scored, steps = scored + len(candidates), steps + 1
+        hit = candidates["_prob"] < target
+        found.append(candidates[hit])
+        beam = candidates[~hit].sort_values(["_prob", "_cost"]).head(beam_width)
+        step_ms = (time.perf_counter() - step_start) * 1000
+        if beam.empty:
+            break
+        # Deeper combinations only cost more; stop once they can't beat the `top` cheapest found.
+        solved = pd.concat(found)["_cost"]
+        if len(solved) >= top and beam["_cost"].min() + MIN_EDIT_COST > solved.nsmallest(top).iloc[-1]:
+            break
+
+    suggestions, kept = [], []
+    if found:
+        ranked = pd.concat(found).sort_values(["_cost", "_prob"])
+        for codes, cost, prob in ranked[["_codes", "_cost", "_prob"]].itertuples(index=False):
+            # A cheaper suggestion already covers any superset of its edits.
+            if any(codes & k == k for k in kept):
+                continue
+            kept.append(codes)
+            suggestions.append(Suggestion(_decode(codes), cost, prob))
+            if len(suggestions) == top:
+                break
+    stats = {"steps": steps, "candidates": scored, "ms": (time.perf_counter() - start) * 1000}
+    return suggestions, stats
+
+
+def render_html(suggestions, target):
+    if not suggestions:
+        return (f"<p>- No combination of the actionable changes brings this customer under {target:.0f}%. "
+                f"<b>Action:</b> Escalate to a personal retention call.</p>")
+    return "".join(
+        f"<p>- To get under {target:.0f}%: {' + '.join(e.action for e in s.edits)} "
+        f"<b>→ {s.prob:.1f}%</b> (cost {s.cost:g})</p>"
+        for s in suggestions
+    )
+
+
+# ----------------- CLI -----------------
+def main():
+    parser = argparse.ArgumentParser(description="Cheapest retention changes for a high-risk customer.")
+    parser.add_argument("profile", nargs="?", help="JSON object with the 12 inputs")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--target", type=float, default=MODERATE_RISK_THRESHOLD, help="cut-off to get under (percent)")
+    parser.add_argument("--beam-width", type=int, default=8)
+    parser.add_argument("--max-edits", type=int, default=3)
+    parser.add_argument("--budget-ms", type=float, default=400)
+    parser.add_argument("--bench", type=int, help="time the search on this many high-risk customers instead")
+    args = parser.parse_args()
+
+    pipeline = calibrated(load_pipeline(args.model), args.model)
+    options = dict(target=args.target, beam_width=args.beam_width, max_edits=args.max_edits, budget_ms=args.budget_ms)
+    if args.bench:
+        df = pd.read_csv(DATA_PATH)
+        X = feature_frame(df)
+        risky = X[pipeline.predict_proba(X)[:, 1] * 100 >= args.target]
+        records = risky.sample(min(args.bench, len(risky)), random_state=0).to_dict(orient="records")
+        runs = [search(pipeline, record, **options) for record in records]
+        ms = np.array([stats["ms"] for _, stats in runs])
+        solved = np.mean([bool(suggestions) for suggestions, _ in runs])
+        print(f"{len(records)} high-risk customers: p50 {np.median(ms):.0f} ms, p95 {np.quantile(ms, 0.95):.0f} ms, "
+              f"{np.mean([s['candidates'] for _, s in runs]):.0f} candidates scored on average, "
+              f"{solved:.0%} with a suggestion")
+        return
+    if not args.profile:
+        parser.error("give a JSON profile or --bench")
+    suggestions, stats = search(pipeline, json.loads(args.profile), **options)
+    for s in suggestions:
+        print(f"{s.prob:5.1f}%  cost {s.cost:g}  " + " + ".join(e.action for e in s.edits))
+    if not suggestions:
+        print(f"No combination of up to {args.max_edits} edits gets under {args.target:.0f}%")
+    print(f"{stats['candidates']} candidates in {stats['steps']} batched calls, {stats['ms']:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
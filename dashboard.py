@@ -0,0 +1,67 @@
+# dashboard.py - Churn by segment, served from the precomputed cube (no model calls)
+import streamlit as st
+
+from segment_cube import CUBE_PATH, SEGMENT_DIMS, load_cube, slice_cube
+
+st.set_page_config(
+    page_title="Netflix Churn Dashboard",
+    page_icon="🎬",
+    layout="wide",
+)
+
+st.markdown(
+    """
+    <style>
+    [data-testid="stAppViewContainer"] { background-color: #141414; }
+    [data-testid="stHeader"] { background: rgba(0,0,0,0); }
+    h1, h2, h3, label, p, span { color: white !important; }
+    </style>
+    """,
+    unsafe_allow_html=True,
+)
+st.markdown("<h1 style='color:#E50914'>🎬 Churn by Segment</h1>", unsafe_allow_html=True)
+
+# ----------------- Load Cube -----------------
+@st.cache_resource(show_spinner=False)
+def get_cube():
+    return load_cube(CUBE_PATH)
+
+try:
+    data = get_cube()
+except FileNotFoundError:
+    st.warning(f"{CUBE_PATH} not found. Run `python segment_cube.py` to build it.")
+    st.stop()
+
+cube = data["cube"]
+
+# ----------------- Filters -----------------
+filter_cols = st.columns(len(SEGMENT_DIMS))
+filters = {}
+for col, dim in zip(filter_cols, SEGMENT_DIMS):
+    with col:
+        filters[dim] = st.multiselect(dim.replace("_", " ").title(), sorted(cube[dim].unique()))
+
+group_by = st.multiselect("Break down by", SEGMENT_DIMS, default=["region"])
+
+# ----------------- Summary -----------------
+total = slice_cube(cube, filters).iloc[0]
+m1, m2, m3 = st.columns(3)
+m1.metric("Customers", f"{int(total['customers']):,}")
+m2.metric("Predicted churn", f"{total['predicted']:.1%}")
+m3.metric("Observed churn", f"{total['observed']:.1%}")
+
+if group_by:
+    view = slice_cube(cube, filters, by=group_by).sort_values("predicted", ascending=False)
+    st.dataframe(
+        view.style.format({"predicted": "{:.1%}", "observed": "{:.1%}"}),
+        use_container_width=True,
+        hide_index=True,
+    )
+    if len(group_by) == 1:
+        st.bar_chart(view.set_index(group_by[0])[["predicted", "observed"]])
+
+# ----------------- Partial Dependence -----------------
+st.markdown("<h3>Partial dependence</h3>", unsafe_allow_html=True)
+curves = data["partial_dependence"]
+feature = st.selectbox("Numeric input", list(curves))
+st.line_chart(curves[feature].set_index(feature))
@@ -0,0 +1,209 @@
+# drift.py - Input drift monitor against the netflix_churn.csv training baseline
+#
+# The baseline fixes the bins once: decile cut points for each numeric input
+# and the observed levels for each categorical, plus a slot for missing /
+# unseen values. DriftMonitor only keeps a count per bin, so recording a row
+# is O(1) and report() computes PSI (and a binned KS distance for numerics)
+# from the counts alone - history is never rescanned.
+#
+#   python drift.py baseline                         # writes drift_baseline.json
+#   python drift.py report customers.csv             # drift of a file vs training
+#   python drift.py report --state drift_state.json  # drift accumulated by score_batch.py
+import argparse
+import bisect
+import json
+import math
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from churn_pipeline import CATEGORICAL_COLS, DATA_PATH, INPUT_DEFAULTS, NUMERIC_COLS, feature_frame, read_customers
+
+BASELINE_PATH = "drift_baseline.json"
+# Usual PSI reading: < 0.1 stable, 0.1-0.2 moderate shift, > 0.2 significant shift.
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.2
+# Below this many rows PSI mostly measures sampling noise, so no status is given.
+MIN_ROWS = 100
+
+
+# ----------------- Baseline -----------------
+def _numeric_bins(values, cuts):
+    # Bin i holds cuts[i-1] < v <= cuts[i]; the last bin is missing.
+    return np.where(np.isnan(values), len(cuts) + 1, np.searchsorted(cuts, values, side="left"))
+
+
+def _category_bins(values, levels):
+    # Unseen levels and missing values share the last bin.
+    codes = pd.Categorical(values, categories=levels).codes
+    return np.where(codes < 0, len(levels), codes)
+
+
+def build_baseline(df, bins=10):
+    numeric, categorical = {}, {}
+    for col in NUMERIC_COLS:
+        values = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float)
+        cuts = np.unique(np.nanquantile(values, np.linspace(0, 1, bins + 1)[1:-1]))
+        counts = np.bincount(_numeric_bins(values, cuts), minlength=len(cuts) + 2)
+        numeric[col] = {"cuts": cuts.tolist(), "counts": counts.tolist()}
+    for col in CATEGORICAL_COLS:
+        levels = sorted(df[col].dropna().astype(str).unique())
+        counts = np.bincount(_category_bins(df[col], levels), minlength=len(levels) + 1)
+        categorical[col] = {"levels": levels, "counts": counts.tolist()}
+    return {"rows": len(df), "numeric": numeric, "categorical": categorical}
+
+
+def load_baseline(path=BASELINE_PATH):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return build_baseline(read_customers(DATA_PATH))
+
+
+# ----------------- Statistics -----------------
+def psi(expected, actual, eps=1e-4):
+    """Population stability index between two count vectors over the same bins."""
+    e = np.maximum(np.asarray(expected, dtype=float) / max(sum(expected), 1), eps)
+    a = np.maximum(np.asarray(actual, dtype=float) / max(sum(actual), 1), eps)
+    return float(np.sum((a - e) * np.log(a / e)))
+
+
+def binned_ks(expected, actual):
+    """Max CDF gap over the bin edges, ignoring the missing bin."""
+    e, a = np.asarray(expected[:-1], dtype=float), np.asarray(actual[:-1], dtype=float)
+    if not e.sum() or not a.sum():
+        return math.nan
+    return float(np.max(np.abs(np.cumsum(e) / e.sum() - np.cumsum(a) / a.sum())))
+
+
+# ----------------- Monitor -----------------
+class DriftMonitor:
+    def __init__(self, baseline):
+        self.baseline = baseline
+        self.counts = {
+            col: np.zeros(len(spec["counts"]), dtype=np.int64)
+            for kind in ("numeric", "categorical") for col, spec in baseline[kind].items()
+        }
+        self._cuts = {col: spec["cuts"] for col, spec in baseline["numeric"].items()}
+        self._levels = {col: {level: i for i, level in enumerate(spec["levels"])}
+                        for col, spec in baseline["categorical"].items()}
+        self._lock = threading.Lock()
+        self.rows = 0
+
+    @classmethod
+    def from_baseline(cls, path=BASELINE_PATH):
+        return cls(load_baseline(path))
+
+    def update(self, X):
+        """Count a frame of inputs (batch path): one bincount per column."""
+        X = feature_frame(X)
+        binned = {}
+        for col, cuts in self._cuts.items():
+            values = pd.to_numeric(X[col], errors="coerce").to_numpy(dtype=float)
+            binned[col] = np.bincount(_numeric_bins(values, cuts), minlength=len(self.counts[col]))
+        for col, levels in self.baseline["categorical"].items():
+            binned[col] = np.bincount(_category_bins(X[col], levels["levels"]), minlength=len(self.counts[col]))
+        with self._lock:
+            for col, counts in binned.items():
+                self.counts[col] += counts
+            self.rows += len(X)
+
+    def update_record(self, record):
+        """Count one input dict (UI / API path) in plain Python."""
+        bins = {}
+        for col, cuts in self._cuts.items():
+            try:
+                value = float(record.get(col, INPUT_DEFAULTS.get(col)))
+            except (TypeError, ValueError):
+                value = math.nan
+            bins[col] = len(cuts) + 1 if math.isnan(value) else bisect.bisect_left(cuts, value)
+        for col, levels in self._levels.items():
+            bins[col] = levels.get(record.get(col), len(levels))
+        with self._lock:
+            for col, i in bins.items():
+                self.counts[col][i] += 1
+            self.rows += 1
+
+    def merge(self, other):
+        with self._lock:
+            for col, counts in other.counts.items():
+                self.counts[col] += counts
+            self.rows += other.rows
+        return self
+
+    def report(self):
+        """PSI per input (plus binned KS for numerics), most drifted first."""
+        rows = []
+        for kind in ("numeric", "categorical"):
+            for col, spec in self.baseline[kind].items():
+                actual = self.counts[col].tolist()
+                value = psi(spec["counts"], actual) if self.rows else math.nan
+                rows.append({
+                    "feature": col,
+                    "kind": kind,
+                    "psi": value,
+                    "ks": binned_ks(spec["counts"], actual) if kind == "numeric" else math.nan,
+                    "missing_or_unseen": actual[-1] / self.rows if self.rows else math.nan,
+                    "status": "too few rows" if self.rows < MIN_ROWS else
+                              "significant" if value > PSI_SIGNIFICANT else
+                              "moderate" if value > PSI_MODERATE else "stable",
+                })
+        return pd.DataFrame(rows).sort_values("psi", ascending=False, ignore_index=True)
+
+    # ----------------- Persistence -----------------
+    def save(self, path):
+        with self._lock:
+            state = {"rows": self.rows, "counts": {col: c.tolist() for col, c in self.counts.items()}}
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, path)
+
+    def load_state(self, path):
+        """Add counts saved by save(); a missing file means nothing recorded yet."""
+        if not os.path.exists(path):
+            return self
+        with open(path) as f:
+            state = json.load(f)
+        with self._lock:
+            for col, counts in state["counts"].items():
+                self.counts[col] += np.asarray(counts, dtype=np.int64)
+            self.rows += state["rows"]
+        return self
+
+
+# ----------------- CLI -----------------
+def main():
+    parser = argparse.ArgumentParser(description="Input drift against the training baseline.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    base = sub.add_parser("baseline", help=f"write {BASELINE_PATH} from the training data")
+    base.add_argument("--data", default=DATA_PATH)
+    base.add_argument("--bins", type=int, default=10)
+    rep = sub.add_parser("report", help="PSI / KS per input")
+    rep.add_argument("input", nargs="?", help="CSV of customers to compare with the baseline")
+    rep.add_argument("--state", help="counts saved by score_batch.py --drift-state")
+    rep.add_argument("--chunksize", type=int, default=500_000)
+    args = parser.parse_args()
+
+    if args.command == "baseline":
+        baseline = build_baseline(read_customers(args.data), bins=args.bins)
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(baseline, f)
+        print(f"Wrote {BASELINE_PATH} ({baseline['rows']} training rows)")
+        return
+    if not args.input and not args.state:
+        parser.error("give a CSV, --state, or both")
+    monitor = DriftMonitor.from_baseline()
+    if args.state:
+        monitor.load_state(args.state)
+    if args.input:
+        for chunk in pd.read_csv(args.input, chunksize=args.chunksize):
+            monitor.update(chunk)
+    print(f"{monitor.rows} rows vs {monitor.baseline['rows']} training rows")
+    print(monitor.report().to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+# event_aggregator.py - Incremental watch/login aggregates from raw event logs
+#
+# The model expects pre-aggregated `watch_hours` (last 7 days),
+# `last_login_days` and `avg_watch_time_per_day` (last `window_days` days).
+# This module tails an append-only JSON-lines event log such as
+#
+#   {"customer_id": "a9b7...", "event": "play",  "ts": "2025-01-03T20:15:00", "minutes": 42}
+#   {"customer_id": "a9b7...", "event": "login", "ts": 1735934400}
+#
+# and keeps per-customer rolling state in fixed-size NumPy arrays, so each
+# run only reads the bytes appended since the previous run. Lines that aren't
+# a JSON object with a customer_id and a parseable ts are skipped and counted.
+# The state (with the new offset) is written only once the feature rows are.
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+SECONDS_PER_DAY = 86400
+
+
+def _epoch_seconds(ts):
+    # Timestamps may be epoch seconds or ISO strings, possibly mixed in one log.
+    # Unparseable values come back as NaN.
+    seconds = pd.to_numeric(ts, errors="coerce").astype(float)
+    text = seconds.isna() & ts.notna()
+    if text.any():
+        parsed = pd.to_datetime(ts[text], utc=True, format="ISO8601", errors="coerce")
+        seconds[text] = (parsed - pd.Timestamp(0, tz="UTC")) / pd.Timedelta(seconds=1)
+    return np.floor(seconds.to_numpy(dtype=float))
+
+
+class EventAggregator:
+    def __init__(self, window_days=30, capacity=1024):
+        self.window_days = window_days
+        self.customer_ids = []
+        self.index = {}
+        self.offset = 0
+        self.skipped = 0  # malformed lines seen by this instance, not persisted
+        # One bucket per day-of-window: hours watched and the epoch day the bucket holds.
+        self.day_hours = np.zeros((capacity, window_days), dtype=np.float32)
+        self.bucket_day = np.full((capacity, window_days), -1, dtype=np.int32)
+        self.last_seen = np.full(capacity, -1, dtype=np.int64)
+        self.dirty = np.zeros(capacity, dtype=bool)
+
+    # ----------------- State Management -----------------
+    def _grow(self, needed):
+        capacity = len(self.last_seen)
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2)
+        pad = new_capacity - capacity
+        self.day_hours = np.vstack([self.day_hours, np.zeros((pad, self.window_days), dtype=np.float32)])
+        self.bucket_day = np.vstack([self.bucket_day, np.full((pad, self.window_days), -1, dtype=np.int32)])
+        self.last_seen = np.concatenate([self.last_seen, np.full(pad, -1, dtype=np.int64)])
+        self.dirty = np.concatenate([self.dirty, np.zeros(pad, dtype=bool)])
+
+    def _rows(self, customer_ids):
+        rows = np.empty(len(customer_ids), dtype=np.int64)
+        for i, cid in enumerate(customer_ids):
+            row = self.index.get(cid)
+            if row is None:
+                row = len(self.customer_ids)
+                self.index[cid] = row
+                self.customer_ids.append(cid)
+            rows[i] = row
+        self._grow(len(self.customer_ids))
+        return rows
+
+    # ----------------- Updates -----------------
+    def update(self, events):
+        """Fold a DataFrame of events (customer_id, event, ts, minutes) into the state."""
+        if len(events) == 0:
+            return
+        ts = _epoch_seconds(events["ts"])
+        valid = ~np.isnan(ts) & events["customer_id"].notna().to_numpy()
+        if not valid.all():
+            self.skipped += int((~valid).sum())
+            events, ts = events[valid], ts[valid]
+            if len(events) == 0:
+                return
+        ts = ts.astype(np.int64)
+        rows = self._rows(events["customer_id"].astype(str).tolist())
+
+        # Any event counts as activity for last_login_days.
+        np.maximum.at(self.last_seen, rows, ts)
+        self.dirty[rows] = True
+
+        is_play = (events["event"] == "play").to_numpy()
+        if not is_play.any():
+            return
+        minutes = pd.to_numeric(events["minutes"], errors="coerce").fillna(0).to_numpy(dtype=np.float32) if "minutes" in events else np.zeros(len(events), np.float32)
+        rows, day, hours = rows[is_play], (ts[is_play] // SECONDS_PER_DAY).astype(np.int32), minutes[is_play] / 60.0
+        slot = day % self.window_days
+
+        # A bucket is recycled when a newer day lands in its slot; events older
+        # than the day a bucket currently holds have fallen out of the window.
+        keys, inverse = np.unique(rows * self.window_days + slot, return_inverse=True)
+        newest = np.full(len(keys), -1, dtype=np.int32)
+        np.maximum.at(newest, inverse, day)
+        key_rows, key_slots = np.divmod(keys, self.window_days)
+        recycle = newest > self.bucket_day[key_rows, key_slots]
+        key_rows, key_slots = key_rows[recycle], key_slots[recycle]
+        self.day_hours[key_rows, key_slots] = 0.0
+        self.bucket_day[key_rows, key_slots] = newest[recycle]
+
+        keep = self.bucket_day[rows, slot] == day
+        np.add.at(self.day_hours, (rows[keep], slot[keep]), hours[keep])
+
+    def tail(self, path, chunk_lines=100_000):
+        """Read events appended to `path` since the last call; returns rows consumed (malformed ones included)."""
+        if not os.path.exists(path):
+            return 0
+        consumed = 0
+        with open(path, "rb") as f:
+            f.seek(self.offset)
+            while True:
+                lines = f.readlines(chunk_lines * 128)
+                if not lines:
+                    break
+                # Leave a partially written trailing line for the next run.
+                if not lines[-1].endswith(b"\n"):
+                    lines = lines[:-1]
+                if not lines:
+                    break
+                records = []
+                for line in lines:
+                    if not line.strip():
+                        continue
+                    consumed += 1
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        record = None
+                    if isinstance(record, dict):
+                        records.append(record)
+                    else:
+                        self.skipped += 1
+                self.update(pd.DataFrame.from_records(records, columns=["customer_id", "event", "ts", "minutes"]))
+                self.offset += sum(len(line) for line in lines)
+        return consumed
+
+    # ----------------- Feature Rows -----------------
+    def features(self, as_of=None, changed_only=False):
+        """Current feature rows, optionally only for customers touched since the last emit."""
+        n = len(self.customer_ids)
+        now = int(pd.Timestamp(as_of if as_of is not None else pd.Timestamp.now(tz="UTC")).timestamp())
+        today = now // SECONDS_PER_DAY
+        rows = np.flatnonzero(self.dirty[:n]) if changed_only else np.arange(n)
+
+        # Buckets dated after as_of (negative age) are left out of both windows.
+        age = today - self.bucket_day[rows]
+        hours = self.day_hours[rows]
+        watch_hours = np.where((age >= 0) & (age < 7), hours, 0.0).sum(axis=1)
+        window_hours = np.where((age >= 0) & (age < self.window_days), hours, 0.0).sum(axis=1)
+
+        # Activity after as_of counts as seen today.
+        last_seen = self.last_seen[rows]
+        last_login_days = np.where(last_seen >= 0, np.maximum((now - last_seen) // SECONDS_PER_DAY, 0), np.nan)
+
+        self.dirty[rows] = False
+        return pd.DataFrame({
+            "customer_id": [self.customer_ids[r] for r in rows],
+            "watch_hours": np.round(watch_hours, 2),
+            "last_login_days": last_login_days,
+            "avg_watch_time_per_day": np.round(window_hours / self.window_days, 2),
+        })
+
+    # ----------------- Persistence -----------------
+    def save(self, path):
+        # Written next to `path` and swapped in, so a crash never leaves a half-written state.
+        n = len(self.customer_ids)
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez_compressed(
+                f,
+                window_days=self.window_days,
+                offset=self.offset,
+                customer_ids=np.array(self.customer_ids, dtype=object).astype(str),
+                day_hours=self.day_hours[:n],
+                bucket_day=self.bucket_day[:n],
+                last_seen=self.last_seen[:n],
+                dirty=self.dirty[:n],
+            )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        state = np.load(path)
+        n = len(state["customer_ids"])
+        agg = cls(window_days=int(state["window_days"]), capacity=max(n, 1024))
+        agg.offset = int(state["offset"])
+        agg.customer_ids = state["customer_ids"].tolist()
+        agg.index = {cid: i for i, cid in enumerate(agg.customer_ids)}
+        agg.day_hours[:n] = state["day_hours"]
+        agg.bucket_day[:n] = state["bucket_day"]
+        agg.last_seen[:n] = state["last_seen"]
+        agg.dirty[:n] = state["dirty"]
+        return agg
+
+
+# ----------------- CLI -----------------
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate raw play/login events into churn features.")
+    parser.add_argument("events", help="append-only JSON-lines event log")
+    parser.add_argument("--state", default="aggregator_state.npz", help="persisted aggregator state")
+    parser.add_argument("--out", default="event_features.csv", help="where to write feature rows")
+    parser.add_argument("--window-days", type=int, default=30)
+    parser.add_argument("--as-of", default=None, help="reference time for recency (default: now)")
+    parser.add_argument("--changed-only", action="store_true", help="emit only customers with new events")
+    args = parser.parse_args()
+
+    if os.path.exists(args.state):
+        agg = EventAggregator.load(args.state)
+    else:
+        agg = EventAggregator(window_days=args.window_days)
+
+    # Nothing is persisted until the whole pass has succeeded: a failed run leaves
+    # the previous state and offset, and the next run re-reads the same events.
+    consumed = agg.tail(args.events)
+    rows = agg.features(as_of=args.as_of, changed_only=args.changed_only)
+    rows.to_csv(f"{args.out}.tmp", index=False)
+    os.replace(f"{args.out}.tmp", args.out)
+    agg.save(args.state)
+    print(f"Consumed {consumed} events ({agg.skipped} malformed, skipped), wrote {len(rows)} feature rows to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+# fast_path.py - Distilled linear model that answers confident cases without the full pipeline
+#
+# `python fast_path.py distill` fits a logistic model in logit space to the
+# full pipeline's probabilities over netflix_churn.csv and stores it as a small
+# JSON file. The student's output range is cut into 2.5-point bins (a bin that
+# straddles a threshold is never safe); a bin is marked safe when, on the distillation data,
+# at least `coverage` of its rows (all of them by default, as the parity gate
+# allows no band changes) fall in the same band as the full pipeline puts them. FastPathScorer answers from the student in safe bins -
+# far from every threshold - and defers to the full pipeline near them, and
+# for numeric inputs in the outer 0.5% tails of the distillation data, where
+# the linear student extrapolates. The JSON records the hash of the artifact
+# it was distilled from; a scorer loaded for any other artifact is not used.
+import argparse
+import json
+import math
+import threading
+
+import numpy as np
+from sklearn.linear_model import Ridge
+
+from churn_pipeline import (
+    CATEGORICAL_COLS, CUTOFFS, DATA_PATH, MODEL_PATH, NUMERIC_COLS, cutoff_band, load_pipeline, read_customers,
+    records_frame,
+)
+from metrics import CACHE
+from model_registry import file_version
+from prob_calibration import calibrated
+
+DISTILLED_PATH = "NetflixChurn_distilled.json"
+BIN_WIDTH = 2.5
+
+
+# ----------------- Distillation -----------------
+def _numeric_block(X):
+    # Raw numerics plus the same derived inputs as FeatureEngineer.
+    numeric = X[NUMERIC_COLS].astype(float)
+    return numeric.assign(
+        inactive_flag=(numeric["last_login_days"] > 30).astype(float),
+        engagement_ratio=numeric["watch_hours"] / (numeric["last_login_days"] + 1),
+    )
+
+
+def distill(pipeline, X, coverage=1.0, min_rows=20, alpha=1.0, tail=0.005, model_sha=None):
+    """Fit the student model on the pipeline's outputs and return it as a dict."""
+    teacher = np.clip(pipeline.predict_proba(X)[:, 1], 1e-3, 1 - 1e-3)
+
+    numeric = _numeric_block(X)
+    means, stds = numeric.mean(), numeric.std().replace(0, 1)
+    Z = ((numeric.fillna(means) - means) / stds).to_numpy()
+    levels = {col: sorted(X[col].dropna().unique().tolist()) for col in CATEGORICAL_COLS}
+    onehot = np.hstack([
+        (X[col].to_numpy()[:, None] == np.array(levels[col], dtype=object)[None, :]).astype(float)
+        for col in CATEGORICAL_COLS
+    ])
+
+    reg = Ridge(alpha=alpha).fit(np.hstack([Z, onehot]), np.log(teacher / (1 - teacher)))
+    weights = reg.coef_
+    student = {
+        "model_sha": model_sha,
+        "intercept": float(reg.intercept_),
+        "numeric": {
+            col: [float(means[col]), float(stds[col]), float(w)]
+            for col, w in zip(numeric.columns, weights[: Z.shape[1]])
+        },
+        "categorical": {},
+    }
+    offset = Z.shape[1]
+    for col in CATEGORICAL_COLS:
+        student["categorical"][col] = dict(zip(levels[col], weights[offset: offset + len(levels[col])].tolist()))
+        offset += len(levels[col])
+
+    prob = _score_array(student, X)
+    bins = np.minimum((prob // BIN_WIDTH).astype(int), int(100 / BIN_WIDTH) - 1)
+    agree = cutoff_band(prob) == cutoff_band(teacher * 100)
+    rows = np.bincount(bins, minlength=int(100 / BIN_WIDTH))
+    agreed = np.bincount(bins, weights=agree, minlength=len(rows))
+    student["bin_width"] = BIN_WIDTH
+    # A calibrated cut-off (calibrate.py) can fall inside a bin; such a bin is never safe.
+    lower = np.arange(len(rows)) * BIN_WIDTH
+    straddles = ((np.array(CUTOFFS)[None, :] > lower[:, None]) &
+                 (np.array(CUTOFFS)[None, :] < lower[:, None] + BIN_WIDTH)).any(axis=1)
+    student["safe_bins"] = ((rows >= min_rows) & (agreed >= coverage * rows) & ~straddles).tolist()
+    # The student only answers where it has seen plenty of rows: the tails go to the full pipeline.
+    student["ranges"] = {col: X[col].quantile([tail, 1 - tail]).tolist() for col in NUMERIC_COLS}
+    return student
+
+
+def _number(value):
+    # Same coercion as records_frame(): numbers and numeric strings; anything else is missing.
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
+
+
+def _in_range(student, X):
+    # Missing values are scored at the mean, which is always in range.
+    ok = np.ones(len(X), dtype=bool)
+    for col, (low, high) in student.get("ranges", {}).items():
+        values = X[col].to_numpy(dtype=float)
+        ok &= ~((values < low) | (values > high))
+    return ok
+
+
+def _score_array(student, X):
+    numeric = _numeric_block(X)
+    z = np.full(len(X), student["intercept"])
+    for col, (mean, std, weight) in student["numeric"].items():
+        z += weight * ((numeric[col].fillna(mean).to_numpy() - mean) / std)
+    for col, table in student["categorical"].items():
+        z += X[col].map(table).fillna(0.0).to_numpy(dtype=float)
+    return 100 / (1 + np.exp(-z))
+
+
+# ----------------- Scoring -----------------
+class FastPathScorer:
+    def __init__(self, pipeline, student):
+        self.pipeline = pipeline
+        self.student = student
+        self.counts = {"fast": 0, "full": 0}
+        self._lock = threading.Lock()  # ScoringPool threads share one scorer
+
+    @classmethod
+    def load(cls, pipeline, path=DISTILLED_PATH, model_path=None):
+        """Scorer for `pipeline`, or None if the student was distilled from another artifact than `model_path`."""
+        with open(path) as f:
+            student = json.load(f)
+        if model_path is not None and student.get("model_sha") not in (None, file_version(model_path)[2]):
+            return None  # e.g. after a hot-swap, until `fast_path.py distill` is re-run
+        return cls(pipeline, student)
+
+    def _count(self, fast, full):
+        # Only scores that were actually returned are counted.
+        with self._lock:
+            self.counts["fast"] += fast
+            self.counts["full"] += full
+        CACHE.labels(cache="fast_path", result="hit").inc(fast)
+        CACHE.labels(cache="fast_path", result="miss").inc(full)
+
+    def _confident(self, prob):
+        safe = np.asarray(self.student["safe_bins"])
+        bins = np.minimum((np.asarray(prob) // self.student["bin_width"]).astype(int), len(safe) - 1)
+        return safe[bins]
+
+    def score_record(self, record):
+        """Score one input dict in plain Python; returns (prob_pct, path)."""
+        values = {col: _number(record.get(col)) for col in NUMERIC_COLS}
+        in_range = all(values[col] is None or low <= values[col] <= high
+                       for col, (low, high) in self.student.get("ranges", {}).items())
+        if in_range:
+            prob = self._student_prob(record, values)
+            safe = self.student["safe_bins"]
+            if safe[min(int(prob // self.student["bin_width"]), len(safe) - 1)]:
+                self._count(1, 0)
+                return prob, "fast"
+        prob = self.pipeline.predict_proba(records_frame([record]))[:, 1][0] * 100
+        self._count(0, 1)
+        return prob, "full"
+
+    def _student_prob(self, record, values):
+        z = self.student["intercept"]
+        for col, (mean, std, weight) in self.student["numeric"].items():
+            if col == "inactive_flag":
+                value = None if values["last_login_days"] is None else float(values["last_login_days"] > 30)
+            elif col == "engagement_ratio":
+                if values["watch_hours"] is None or values["last_login_days"] is None:
+                    value = None
+                else:
+                    value = values["watch_hours"] / (values["last_login_days"] + 1)
+            else:
+                value = values[col]
+            z += weight * (((mean if value is None else value) - mean) / std)
+        for col, table in self.student["categorical"].items():
+            z += table.get(record.get(col), 0.0)
+        return 100 / (1 + math.exp(-z))
+
+    def score_frame(self, X):
+        """Score a frame; uncertain rows go to the full pipeline in one call."""
+        prob = _score_array(self.student, X)
+        confident = self._confident(prob) & _in_range(self.student, X)
+        if not confident.all():
+            prob[~confident] = self.pipeline.predict_proba(X[~confident])[:, 1] * 100
+        self._count(int(confident.sum()), int((~confident).sum()))
+        return prob, np.where(confident, "fast", "full")
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+        total = sum(counts.values())
+        return {**counts, "fast_share": counts["fast"] / total if total else 0.0}
+
+
+# ----------------- CLI -----------------
+def main():
+    parser = argparse.ArgumentParser(description="Distill and evaluate the fast-path churn model.")
+    parser.add_argument("command", choices=["distill", "evaluate"])
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--out", default=DISTILLED_PATH)
+    parser.add_argument("--coverage", type=float, default=1.0,
+                        help="band agreement a probability bin needs to be answered by the student")
+    args = parser.parse_args()
+
+    # The student learns the probabilities users see, so distill after calibration.
+    pipeline = calibrated(load_pipeline(args.model), args.model)
+    X = read_customers(args.data)
+    if args.command == "distill":
+        student = distill(pipeline, X, coverage=args.coverage, model_sha=file_version(args.model)[2])
+        with open(args.out, "w") as f:
+            json.dump(student, f, indent=2)
+        print(f"Wrote {args.out} ({sum(student['safe_bins'])} of {len(student['safe_bins'])} bins on the fast path)")
+
+    scorer = FastPathScorer.load(pipeline, args.out, args.model)
+    if scorer is None:
+        parser.error(f"{args.out} was distilled from another model than {args.model}; re-run distill")
+    prob, path = scorer.score_frame(X)
+    full = pipeline.predict_proba(X)[:, 1] * 100
+    print(f"Fast path share: {scorer.stats()['fast_share']:.1%}")
+    print(f"Band disagreements vs full pipeline: {int((cutoff_band(prob) != cutoff_band(full)).sum())} / {len(X)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# insights.py - Business-insight rules evaluated over a whole scored frame at once
+#
+# Each rule is a row in RULES: a DataFrame.eval() predicate over the 12 inputs
+# plus `churn_prob` (percent), with the cut-offs as @churn (two-band apps),
+# @moderate and @high. action_codes() evaluates every predicate as one
+# vectorized pass per rule and packs the results into a uint16 bit mask per
+# customer; decode()/render_html() turn a code back into text for the UI, and
+# `python insights.py` writes the codes (or one row per action) for CRM use.
+import argparse
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from churn_pipeline import CHURN_THRESHOLD, HIGH_RISK_THRESHOLD, MODERATE_RISK_THRESHOLD, NUMERIC_COLS
+
+Rule = namedtuple("Rule", ["code", "feature", "when", "insight", "action"])
+
+RULES = [
+    Rule("RETENTION_OFFER", None, "churn_prob >= @churn",
+         "Churn probability is high.", "Consider retention offers or loyalty discounts."),
+    Rule("REENGAGE", "last_login_days", "last_login_days > 30",
+         "Customers inactive for many days are more likely to churn.",
+         "Trigger re-engagement emails or time-bound offers."),
+    Rule("WATCHLIST", "avg_watch_time_per_day", "avg_watch_time_per_day < 1",
+         "Low daily engagement signals rising churn risk.", "Push personalized watchlists and reminders."),
+    Rule("UPGRADE_OFFER", "subscription_type", "subscription_type == 'Basic'",
+         "Basic plan users may be more price sensitive and churn more often.",
+         "Provide targeted upgrade offers to Standard/Premium."),
+    Rule("LOCALIZE", "region", "churn_prob >= @moderate",
+         "Some regions exhibit higher churn patterns.", "Localize content and marketing campaigns."),
+    Rule("AUTO_RENEW", "payment_method", "payment_method in ['Gift Card', 'Crypto']",
+         "Gift card or non-recurring payment methods may lead to faster churn.",
+         "Encourage auto-renewal or card-on-file options."),
+    Rule("CURATED_CONTENT", "favorite_genre", "churn_prob >= @churn",
+         "Favorite genre is the strongest hook for re-engagement.", "Send curated content emails."),
+    Rule("PROFILE_SHARING", "number_of_profiles", "number_of_profiles <= 1 and churn_prob >= @moderate",
+         "Single-profile accounts have fewer reasons to stay.",
+         "Encourage family/friend sharing for retention."),
+    Rule("LOYALTY_PERKS", None, "churn_prob < @moderate",
+         "Customer is likely to stay.", "Consider loyalty rewards or early access perks."),
+    Rule("FAMILY_UPSELL", "number_of_profiles", "churn_prob < @moderate and number_of_profiles >= 3",
+         "Several profiles share this account.", "Upsell family plan or extra profiles."),
+    Rule("RECOMMENDATIONS", "watch_hours", "churn_prob >= @churn",
+         "Weekly watch hours drive this customer's risk.", "Suggest personalized recommendations."),
+    Rule("PREMIUM_ADDONS", "subscription_type", "churn_prob >= @churn and subscription_type != 'Basic'",
+         "Paying for a higher plan without using it invites cancellation.", "Upsell premium features or add-ons."),
+    Rule("BINGE_GUIDES", "avg_watch_time_per_day", "churn_prob >= @churn and avg_watch_time_per_day >= 1",
+         "Long daily sessions are not turning into loyalty.", "Suggest binge-watching guides."),
+    Rule("SIMILAR_CONTENT", "favorite_genre", "churn_prob < @churn",
+         "Engagement is healthy; keep it that way.", "Recommend new content similar to the favorite genre."),
+    Rule("CONTENT_BUNDLES", "avg_watch_time_per_day", "churn_prob < @churn and avg_watch_time_per_day >= 1",
+         "Regular daily viewing.", "Suggest content bundles."),
+]
+ACTION_CODES = {rule.code: 1 << bit for bit, rule in enumerate(RULES)}
+
+
+def action_codes(scored, rules=RULES):
+    """uint16 bit mask per row; bit i is set when RULES[i] fires."""
+    # Single-row app frames can carry None in object columns; comparisons need numbers.
+    untyped = [c for c in NUMERIC_COLS + ["churn_prob"] if c in scored and scored[c].dtype == object]
+    if untyped:
+        scored = scored.assign(**{c: pd.to_numeric(scored[c], errors="coerce") for c in untyped})
+    codes = np.zeros(len(scored), dtype=np.uint16)
+    params = {"churn": CHURN_THRESHOLD, "high": HIGH_RISK_THRESHOLD, "moderate": MODERATE_RISK_THRESHOLD}
+    for bit, rule in enumerate(rules):
+        fired = scored.eval(rule.when, local_dict=params)
+        codes |= fired.fillna(False).to_numpy(dtype=bool).astype(np.uint16) << bit
+    return codes
+
+
+def decode(code, rules=RULES):
+    """Rules whose bit is set in a single action code."""
+    return [rule for bit, rule in enumerate(rules) if int(code) >> bit & 1]
+
+
+def render_html(rules):
+    return "".join(f"<p>- {r.insight} <b>Action:</b> {r.action}</p>" for r in rules)
+
+
+def explode_actions(scored, codes, id_col="customer_id"):
+    """Long format (one row per customer and action) for CRM exports."""
+    bits = (codes[:, None] >> np.arange(len(RULES), dtype=np.uint16)) & 1
+    rows, rule_idx = np.nonzero(bits)
+    return pd.DataFrame({
+        id_col: scored[id_col].to_numpy()[rows] if id_col in scored else rows,
+        "action": np.array([r.code for r in RULES])[rule_idx],
+    })
+
+
+# ----------------- CLI -----------------
+def main():
+    parser = argparse.ArgumentParser(description="Attach recommended actions to a scored customer file.")
+    parser.add_argument("scored", help="output of score_batch.py (needs churn_prob)")
+    parser.add_argument("--out", default="customer_actions.csv")
+    parser.add_argument("--long", action="store_true", help="one row per customer and action")
+    parser.add_argument("--chunksize", type=int, default=500_000)
+    args = parser.parse_args()
+
+    header, rows = True, 0
+    for chunk in pd.read_csv(args.scored, chunksize=args.chunksize):
+        codes = action_codes(chunk)
+        if args.long:
+            out = explode_actions(chunk, codes)
+        else:
+            out = chunk.assign(action_code=codes)
+        out.to_csv(args.out, mode="w" if header else "a", header=header, index=False)
+        header, rows = False, rows + len(chunk)
+    print(f"Wrote actions for {rows} customers to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+# metrics.py - In-process counters and latency histograms in Prometheus text format
+#
+# Writers never take a lock: each thread increments its own shard (a plain
+# list found through threading.local), and a scrape sums the shards. Shards of
+# finished threads are folded into a retired total when a new thread
+# registers, so per-request threads (Streamlit reruns) don't pile up.
+#
+#   GET /metrics on the scoring service, or start_http_server() from an app
+#   score_batch.py --metrics-file batch.prom   (node_exporter textfile collector)
+import bisect
+import math
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_PORT = int(os.environ.get("CHURN_METRICS_PORT", 9108))
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+REGISTRY = []
+
+
+class _Shards:
+    def __init__(self, size):
+        self.size = size
+        self._local = threading.local()
+        self._live = []
+        self._retired = [0.0] * size
+        self._lock = threading.Lock()
+
+    def mine(self):
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = [0.0] * self.size
+            with self._lock:
+                live = []
+                for thread, shard in self._live:
+                    if thread.is_alive():
+                        live.append((thread, shard))
+                    else:
+                        self._retired = [a + b for a, b in zip(self._retired, shard)]
+                self._live = live + [(threading.current_thread(), values)]
+            return values
+
+    def total(self):
+        with self._lock:
+            shards = [self._retired] + [shard for _, shard in self._live]
+        return [sum(column) for column in zip(*shards)]
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self.labels()  # unlabelled metrics are exposed as 0 before their first update
+        REGISTRY.append(self)
+
+    def labels(self, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._child())
+        return child
+
+    def children(self):
+        return [(dict(zip(self.labelnames, key)), child) for key, child in list(self._children.items())]
+
+
+class _CounterChild:
+    def __init__(self):
+        self._shards = _Shards(1)
+
+    def inc(self, amount=1):
+        self._shards.mine()[0] += amount
+
+    def value(self):
+        return self._shards.total()[0]
+
+
+class _GaugeChild:
+    def __init__(self):
+        self._value = 0.0
+
+    def set(self, value):
+        self._value = float(value)
+
+    def value(self):
+        return self._value
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.bounds = list(buckets) + [math.inf]
+        self._shards = _Shards(len(self.bounds) + 1)  # one count per bucket, then the sum
+
+    def observe(self, value):
+        shard = self._shards.mine()
+        shard[bisect.bisect_left(self.bounds, value)] += 1
+        shard[-1] += value
+
+    def value(self):
+        totals = self._shards.total()
+        return totals[:-1], totals[-1]
+
+    def quantile(self, q):
+        """Estimate from bucket counts, interpolating linearly inside a bucket."""
+        counts, _ = self.value()
+        total = sum(counts)
+        if not total:
+            return math.nan
+        rank, seen, lower = q * total, 0.0, 0.0
+        for bound, count in zip(self.bounds, counts):
+            if count and seen + count >= rank:
+                upper = bound if math.isfinite(bound) else lower
+                return lower + (upper - lower) * (rank - seen) / count
+            seen, lower = seen + count, bound
+        return lower
+
+
+class Counter(_Metric):
+    kind = "counter"
+    _child = _CounterChild
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+    _child = _GaugeChild
+
+    def set(self, value):
+        self.labels().set(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        super().__init__(name, help, labelnames)
+
+    def _child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+
+# ----------------- Metrics -----------------
+PREDICTIONS = Counter("churn_predictions_total", "Customers scored.", ["path"])
+LATENCY = Histogram("churn_prediction_latency_seconds",
+                    "Latency of one scoring call (UI submit, API request, batch chunk).", ["path"])
+CACHE = Counter("churn_cache_requests_total",
+                "Cache lookups by outcome (fast_path hit: answered by the distilled model).", ["cache", "result"])
+MODEL_LOAD_SECONDS = Gauge("churn_model_load_seconds", "Load and warm-up time of the current model.")
+MODEL_LOADS = Counter("churn_model_loads_total", "Model loads, including hot-swaps.")
+BATCH_ROWS_PER_SECOND = Gauge("churn_batch_rows_per_second", "Throughput of the last batch job.", ["job"])
+
+
+# ----------------- Exposition -----------------
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+
+
+def _format(value):
+    if value == math.inf:
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def samples(registry=REGISTRY):
+    """(sample name, labels, value) rows - the same numbers render() exposes."""
+    rows = []
+    for metric in registry:
+        for labels, child in metric.children():
+            if metric.kind != "histogram":
+                rows.append((metric.name, labels, child.value()))
+                continue
+            counts, total = child.value()
+            cumulative = 0
+            for bound, count in zip(child.bounds, counts):
+                cumulative += count
+                rows.append((f"{metric.name}_bucket", {**labels, "le": _format(bound)}, cumulative))
+            rows.append((f"{metric.name}_sum", labels, total))
+            rows.append((f"{metric.name}_count", labels, cumulative))
+    return rows
+
+
+def render(registry=REGISTRY):
+    """Prometheus text exposition format (0.0.4)."""
+    lines = []
+    by_metric = {}
+    for name, labels, value in samples(registry):
+        by_metric.setdefault(name, []).append((labels, value))
+    for metric in registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        names = [metric.name] if metric.kind != "histogram" else [
+            f"{metric.name}_bucket", f"{metric.name}_sum", f"{metric.name}_count"
+        ]
+        for name in names:
+            for labels, value in by_metric.get(name, []):
+                lines.append(f"{name}{_labels(labels)} {_format(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path, registry=REGISTRY):
+    # Write-then-rename so a collector never reads a half-written file.
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(render(registry))
+    os.replace(tmp, path)
+
+
+def start_http_server(port=METRICS_PORT, host="127.0.0.1"):
+    """Serve GET /metrics from a daemon thread; returns the server."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = render().encode() if self.path == "/metrics" else b""
+            self.send_response(200 if body else 404)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
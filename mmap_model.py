@@ -0,0 +1,192 @@
+# mmap_model.py - Memory-mapped model artifact shared by every worker on a host
+#
+# joblib.load(..., mmap_mode="r") memory-maps the NumPy arrays in a pickle, but
+# sklearn's Tree.__setstate__ copies its node arrays into private buffers, so a
+# fitted forest still ends up once per process. `python mmap_model.py export`
+# rewrites the pipeline with the forest flattened into a MappedForest (plain
+# arrays, same predictions) and dumps it uncompressed. Loaded with mmap_mode,
+# those arrays stay file-backed pages that all workers share via the page cache.
+# Only random / extra-trees forests can be flattened; other models (e.g. the
+# train_hgb.py artifact) are refused by `export`.
+#
+#   python mmap_model.py export                  # writes NetflixChurn_pipeline_mmap.pkl
+#   python mmap_model.py measure --workers 4     # per-worker RSS, pickle vs mmap
+import argparse
+import multiprocessing
+import os
+
+import joblib
+import numpy as np
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+from sklearn.pipeline import Pipeline
+
+from churn_pipeline import DATA_PATH, MODEL_PATH, load_pipeline, read_customers
+
+MMAP_PATH = "NetflixChurn_pipeline_mmap.pkl"
+
+
+class MappedForest(ClassifierMixin, BaseEstimator):
+    """predict_proba of a fitted RandomForestClassifier from flat node arrays.
+
+    All trees share one set of arrays indexed by global node id. Leaves point
+    to themselves, so every row walks exactly `max_depth` steps and the walk
+    is a handful of vectorized gathers per level.
+    """
+
+    @classmethod
+    def from_forest(cls, forest):
+        self = cls()
+        trees = [est.tree_ for est in forest.estimators_]
+        offsets = np.cumsum([0] + [t.node_count for t in trees])
+        node_ids = np.arange(offsets[-1])
+        leaf = np.concatenate([t.children_left == -1 for t in trees])
+        left = np.concatenate([t.children_left + off for t, off in zip(trees, offsets[:-1])])
+        right = np.concatenate([t.children_right + off for t, off in zip(trees, offsets[:-1])])
+        # children[2 * node + went_right] is the next node; a leaf's children are itself.
+        self.children = np.stack([np.where(leaf, node_ids, left), np.where(leaf, node_ids, right)], axis=1)
+        self.children = self.children.astype(np.int32).ravel()
+        self.feature = np.where(leaf, 0, np.concatenate([t.feature for t in trees])).astype(np.int32)
+        self.threshold = np.concatenate([t.threshold for t in trees])
+        value = np.concatenate([t.value[:, 0, :] for t in trees])
+        self.value = value / value.sum(axis=1, keepdims=True)
+        self.roots = offsets[:-1].astype(np.int32)
+        self.max_depth = max(t.max_depth for t in trees)
+        self.classes_ = forest.classes_
+        self.n_features_in_ = forest.n_features_in_
+        return self
+
+    def fit(self, X=None, y=None):
+        # Built from an already fitted forest; fit() only lets sklearn treat it as an estimator.
+        return self
+
+    def predict_proba(self, X, chunksize=2_000):
+        # Same input handling as sklearn trees: float32 features, `x <= threshold` goes left.
+        X = X.toarray() if hasattr(X, "toarray") else X
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        out = np.empty((len(X), len(self.classes_)))
+        for start in range(0, len(X), chunksize):
+            block = X[start:start + chunksize]
+            flat, row_base = block.ravel(), np.arange(len(block))[:, None] * block.shape[1]
+            node = np.broadcast_to(self.roots, (len(block), len(self.roots)))
+            for _ in range(self.max_depth):
+                went_right = flat[row_base + self.feature[node]] > self.threshold[node]
+                node = self.children[2 * node + went_right]
+            out[start:start + chunksize] = self.value[node].mean(axis=1)
+        return out
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+def is_forest(model):
+    return isinstance(model, (RandomForestClassifier, ExtraTreesClassifier))
+
+
+def mapped_pipeline(pipeline):
+    """Pipeline with the same preprocessing and a MappedForest as its model; None if the model is not a forest."""
+    if not is_forest(pipeline.steps[-1][1]):
+        return None
+    return Pipeline(pipeline.steps[:-1] + [(pipeline.steps[-1][0], MappedForest.from_forest(pipeline.steps[-1][1]))])
+
+
+def export(pipeline, path=MMAP_PATH):
+    mapped = mapped_pipeline(pipeline)
+    if mapped is None:
+        raise TypeError(f"{type(pipeline.steps[-1][1]).__name__} is not a forest; only forests can be memory-mapped")
+    # Uncompressed: joblib can only memory-map arrays stored raw in the file.
+    joblib.dump(mapped, path, compress=0)
+
+
+def load_mapped(path=MMAP_PATH):
+    return load_pipeline(path, mmap_mode="r")
+
+
+# ----------------- Memory Report -----------------
+def memory_kb():
+    """Resident, proportional and private memory of this process (Linux /proc)."""
+    fields = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1])
+    except FileNotFoundError:
+        import resource  # no smaps (macOS, Windows WSL1): peak RSS only
+        return {"rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "private": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def _worker(path, mmap, rows, barrier, queue):
+    before = memory_kb()
+    pipeline = load_mapped(path) if mmap else load_pipeline(path)
+    loaded = memory_kb()
+    pipeline.predict_proba(rows)
+    scored = memory_kb()
+    barrier.wait()  # every worker holds its model while the others measure
+    queue.put((os.getpid(), before, loaded, scored, memory_kb()))
+    barrier.wait()
+
+
+def measure(path, mmap, workers, rows):
+    ctx = multiprocessing.get_context("spawn")
+    barrier, queue = ctx.Barrier(workers), ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(path, mmap, rows, barrier, queue)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    results = [queue.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return results
+
+
+def _print_measurement(label, results):
+    print(f"\n{label}")
+    print(f"{'pid':>8} {'RSS before':>11} {'after load':>11} {'after score':>12} {'PSS':>9} {'private':>9}  (MB)")
+    for pid, before, loaded, scored, final in results:
+        print(f"{pid:>8} {before['rss'] / 1024:>11.1f} {loaded['rss'] / 1024:>11.1f} {scored['rss'] / 1024:>12.1f} "
+              f"{final.get('pss', 0) / 1024:>9.1f} {final.get('private', 0) / 1024:>9.1f}")
+    total_pss = sum(r[4].get("pss", 0) for r in results) / 1024
+    print(f"host total (sum of PSS): {total_pss:.1f} MB")
+
+
+# ----------------- CLI -----------------
+def main():
+    parser = argparse.ArgumentParser(description="Export and measure the memory-mapped model artifact.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    exp = sub.add_parser("export", help=f"write {MMAP_PATH}")
+    exp.add_argument("--model", default=MODEL_PATH)
+    exp.add_argument("--out", default=MMAP_PATH)
+    mea = sub.add_parser("measure", help="per-worker RSS: pickled vs memory-mapped artifact")
+    mea.add_argument("--model", default=MODEL_PATH)
+    mea.add_argument("--mmap-model", default=MMAP_PATH)
+    mea.add_argument("--workers", type=int, default=4)
+    mea.add_argument("--rows", type=int, default=1000, help="rows each worker scores after loading")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        pipeline = load_pipeline(args.model)
+        try:
+            export(pipeline, args.out)
+        except TypeError as e:
+            parser.error(str(e))
+        X = read_customers(DATA_PATH)
+        diff = np.abs(load_mapped(args.out).predict_proba(X)[:, 1] - pipeline.predict_proba(X)[:, 1]).max()
+        print(f"Wrote {args.out} ({os.path.getsize(args.out) / 2**20:.1f} MB); max |diff| vs pickle {diff:.2e}")
+    else:
+        rows = read_customers(DATA_PATH).head(args.rows)
+        _print_measurement(f"{args.workers} workers, {args.model} (unpickled copy each)",
+                           measure(args.model, False, args.workers, rows))
+        _print_measurement(f"{args.workers} workers, {args.mmap_model} (memory-mapped)",
+                           measure(args.mmap_model, True, args.workers, rows))
+
+
+if __name__ == "__main__":
+    # Run through the imported module so the artifact pickles mmap_model.MappedForest, not __main__.MappedForest.
+    import mmap_model
+    mmap_model.main()
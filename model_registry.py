@@ -0,0 +1,90 @@
+# model_registry.py - Hot-swappable model holder for the apps and the scoring service
+#
+# ModelRegistry loads NetflixChurn_pipeline.pkl once, then a daemon thread
+# polls the file. When it changes, the new pipeline is loaded and warmed in
+# the background together with anything derived from it (float32 copy, fast
+# path, explainer...), and only then swapped in with a single attribute
+# assignment. Callers take `registry.current` once per request, so a request
+# that started on the old model finishes on it.
+import hashlib
+import os
+import threading
+import time
+from collections import namedtuple
+
+from churn_pipeline import MODEL_PATH, load_pipeline, warm_up
+from metrics import MODEL_LOAD_SECONDS, MODEL_LOADS
+
+ModelSnapshot = namedtuple("ModelSnapshot", ["pipeline", "version", "extras", "loaded_at"])
+
+
+def file_version(path):
+    """Cheap change detector: size and mtime, plus a content hash for display."""
+    stat = os.stat(path)
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:12]
+    return (stat.st_size, stat.st_mtime_ns, digest)
+
+
+class ModelRegistry:
+    def __init__(self, path=MODEL_PATH, extras=None, poll_interval=5.0, loader=load_pipeline, warmup=None):
+        self.path = path
+        self.extras = extras or {}
+        self.poll_interval = poll_interval
+        self.loader = loader
+        self.warmup = warmup or warm_up
+        self.last_error = None
+        self.swaps = 0
+        self._failed = None  # (size, mtime) of an artifact that didn't load; retried once it changes
+        self._stop = threading.Event()
+        self._thread = None
+        self.current = self._load(file_version(path))
+
+    def _load(self, version):
+        start = time.perf_counter()
+        pipeline = self.loader(self.path)
+        self.warmup(pipeline)
+        extras = {name: build(pipeline) for name, build in self.extras.items()}
+        MODEL_LOAD_SECONDS.set(time.perf_counter() - start)
+        MODEL_LOADS.inc()
+        return ModelSnapshot(pipeline, version, extras, time.time())
+
+    def check(self):
+        """Load and swap in the artifact if it changed; returns True on a swap."""
+        stamp = None
+        try:
+            stat = os.stat(self.path)
+            stamp = (stat.st_size, stat.st_mtime_ns)
+            if stamp == self.current.version[:2] or stamp == self._failed:
+                return False
+            snapshot = self._load(file_version(self.path))
+        except Exception as e:  # a half-written or broken artifact must not take serving down
+            self._failed = stamp
+            self.last_error = f"{type(e).__name__}: {e}"
+            return False
+        self.current = snapshot
+        self.swaps += 1
+        self._failed = None
+        self.last_error = None
+        return True
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            self.check()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name="model-registry", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        return {
+            "model_version": self.current.version[2],
+            "loaded_at": self.current.loaded_at,
+            "swaps": self.swaps,
+            "last_error": self.last_error,
+        }
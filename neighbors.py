@@ -0,0 +1,118 @@
+# neighbors.py - "Customers like this": the nearest real customers to a scored profile
+#
+# Customers in netflix_churn.csv are grouped by the key categoricals (plan and
+# region) and every group gets a KD-tree over the standardized numerics, so a
+# lookup only compares against customers on the same plan in the same region
+# and costs O(log n). A key never seen, or a group with fewer than k
+# customers, falls back to a tree over everyone. Each indexed customer keeps
+# what happened to them (`churned`) and the model's score at build time.
+#
+#   python neighbors.py build              # writes customer_neighbors.pkl, prints query latency
+#   python neighbors.py query '{"age": 30, "subscription_type": "Basic", "region": "Asia", "watch_hours": 2}'
+import argparse
+import json
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KDTree
+
+from churn_pipeline import DATA_PATH, MODEL_PATH, feature_frame, load_pipeline
+from prob_calibration import calibrated
+
+NEIGHBORS_PATH = "customer_neighbors.pkl"
+KEY_COLS = ["subscription_type", "region"]
+# no_of_devices is not in netflix_churn.csv, so it can't tell customers apart.
+DISTANCE_COLS = ["age", "watch_hours", "last_login_days", "avg_watch_time_per_day", "number_of_profiles"]
+SHOWN_COLS = ["customer_id", "age", "subscription_type", "region", "device", "watch_hours",
+              "last_login_days", "avg_watch_time_per_day", "number_of_profiles", "churn_prob", "churned"]
+
+
+class NeighborIndex:
+    def __init__(self, customers, key_cols=KEY_COLS, distance_cols=DISTANCE_COLS, leaf_size=30):
+        self.key_cols = key_cols
+        self.distance_cols = distance_cols
+        self.customers = customers[[c for c in SHOWN_COLS if c in customers]].reset_index(drop=True)
+        values = customers[distance_cols].apply(pd.to_numeric, errors="coerce")
+        self.fill = values.median().to_numpy()
+        Z = values.fillna(values.median()).to_numpy()
+        self.mean, self.std = Z.mean(axis=0), Z.std(axis=0)
+        self.std[self.std == 0] = 1.0
+        Z = (Z - self.mean) / self.std
+        self.groups = {
+            key: (KDTree(Z[rows], leaf_size=leaf_size), rows)
+            for key, rows in customers.reset_index(drop=True).groupby(key_cols).indices.items()
+        }
+        self.everyone = (KDTree(Z, leaf_size=leaf_size), np.arange(len(Z)))
+
+    def _scaled(self, record):
+        z = np.empty(len(self.distance_cols))
+        for i, col in enumerate(self.distance_cols):
+            try:
+                z[i] = float(record.get(col))
+            except (TypeError, ValueError):
+                z[i] = np.nan
+        z = np.where(np.isnan(z), self.fill, z)
+        return ((z - self.mean) / self.std)[None, :]
+
+    def query(self, record, k=10):
+        """The k most similar customers (same plan and region when possible), nearest first."""
+        key = tuple(record.get(col) for col in self.key_cols)
+        tree, rows = self.groups.get(key, self.everyone)
+        matched = len(rows) >= k
+        if not matched:
+            tree, rows = self.everyone
+        distance, pos = tree.query(self._scaled(record), k=min(k, len(rows)))
+        similar = self.customers.iloc[rows[pos[0]]].assign(distance=distance[0])
+        similar.attrs["same_key"] = matched
+        return similar.reset_index(drop=True)
+
+    def save(self, path=NEIGHBORS_PATH):
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load(path=NEIGHBORS_PATH):
+        return joblib.load(path)
+
+
+def build_index(data_path=DATA_PATH, model_path=MODEL_PATH):
+    df = pd.read_csv(data_path)
+    pipeline = calibrated(load_pipeline(model_path), model_path)
+    df["churn_prob"] = np.round(pipeline.predict_proba(feature_frame(df))[:, 1] * 100, 2)
+    return NeighborIndex(df)
+
+
+# ----------------- CLI -----------------
+def main():
+    parser = argparse.ArgumentParser(description="Build and query the customers-like-this index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    bld = sub.add_parser("build", help=f"write {NEIGHBORS_PATH}")
+    bld.add_argument("--data", default=DATA_PATH)
+    bld.add_argument("--model", default=MODEL_PATH)
+    qry = sub.add_parser("query", help="nearest customers to one JSON profile")
+    qry.add_argument("profile", help="JSON object with the app's inputs")
+    qry.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        index = build_index(args.data, args.model)
+        index.save()
+        sample = index.customers.sample(min(1000, len(index.customers)), random_state=0).to_dict(orient="records")
+        start = time.perf_counter()
+        for record in sample:
+            index.query(record)
+        per_query = (time.perf_counter() - start) / len(sample) * 1000
+        print(f"Wrote {NEIGHBORS_PATH}: {len(index.customers)} customers in {len(index.groups)} "
+              f"{' x '.join(KEY_COLS)} groups; {per_query:.2f} ms per top-10 query")
+        return
+    similar = NeighborIndex.load().query(json.loads(args.profile), k=args.k)
+    print(similar.to_string(index=False))
+    print(f"{similar['churned'].mean():.0%} of these {len(similar)} customers churned"
+          + ("" if similar.attrs["same_key"] else " (no group for this plan / region: searched everyone)"))
+
+
+if __name__ == "__main__":
+    # Run through the imported module so the index pickles neighbors.NeighborIndex, not __main__.NeighborIndex.
+    import neighbors
+    neighbors.main()
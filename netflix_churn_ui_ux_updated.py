@@ -6,7 +6,8 @@ import pandas as pd
 import joblib
 import base64
 import numpy as np
-from sklearn.base import BaseEstimator, TransformerMixin
+from churn_pipeline import HIGH_RISK_THRESHOLD, MODEL_PATH, MODERATE_RISK_THRESHOLD, warm_up
+from prob_calibration import calibrated
 
 st.set_page_config(
     page_title="Netflix Customer Churn Prediction",
@@ -67,48 +68,26 @@ st.markdown(page_bg, unsafe_allow_html=True)
 
 st.markdown("<h1 style='color:white'>🎬 Netflix Customer Churn Prediction</h1>", unsafe_allow_html=True)
 
-class MissingValueHandler(BaseEstimator, TransformerMixin):
-    def __init__(self, numeric_cols=None, categorical_cols=None):
-        self.numeric_cols = numeric_cols or []
-        self.categorical_cols = categorical_cols or []
-
-    def fit(self, X, y=None):
-        return self
-
-    def transform(self, X):
-        return X
-
-class OutlierClipper(BaseEstimator, TransformerMixin):
-    def __init__(self, cols=None, lower=0.01, upper=0.99):
-        self.cols = cols or []
-        self.lower = lower
-        self.upper = upper
-
-    def fit(self, X, y=None):
-        return self
-
-    def transform(self, X):
-        return X
-
-class FeatureEngineer(BaseEstimator, TransformerMixin):
-    def fit(self, X, y=None):
-        return self
-
-    def transform(self, X):
-        return X
+# ----------------- Pipeline Helper Classes -----------------
+# Shared with the offline tools; the names must live in this module to unpickle the pipeline.
+from churn_pipeline import MissingValueHandler, OutlierClipper, FeatureEngineer  # noqa: F401
 
 @st.cache_resource
 def load_model():
-    return joblib.load("NetflixChurn_pipeline.pkl")
+    # Calibration table (python prob_calibration.py fit) applied after the pipeline; unchanged if there is none
+    pipeline = calibrated(joblib.load(MODEL_PATH), MODEL_PATH)
+    # Warmed right after load so the first user doesn't pay the cold-start cost
+    warm_up(pipeline)
+    return pipeline
 
 pipeline = load_model()
 
 def predict_churn(user_input_df):
     prob = pipeline.predict_proba(user_input_df)[:, 1][0] * 100
-    if prob >= 75:
+    if prob >= HIGH_RISK_THRESHOLD:
         color = "red"
         message = "⚠ High Risk! Consider reaching out to the customer."
-    elif prob >= 50:
+    elif prob >= MODERATE_RISK_THRESHOLD:
         color = "orange"
         message = "🟠 Moderate Risk. Offer incentives to retain."
     else:
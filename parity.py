@@ -0,0 +1,171 @@
+# parity.py - Golden-set parity harness for every scoring backend
+#
+# Every optimized scoring path must give the reference pipeline's answers.
+# golden_set.csv is a fixed sample of netflix_churn.csv plus edge cases at the
+# input limits the apps accept; `python parity.py` scores it with each backend
+# in BACKENDS and fails when a backend drifts past its tolerance or moves any
+# customer across any cut-off (the churn one of the two-band apps as well as
+# moderate / high, see cutoff_band). When NetflixChurn_calibration.json was
+# fitted for the model, the reference and every backend score through it, as
+# the apps do; re-run parity after `prob_calibration.py fit`.
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from churn_pipeline import (
+    DATA_PATH, MODEL_PATH, coded_pipeline, cutoff_band, float32_pipeline, load_pipeline, read_customers, to_float32,
+)
+from fast_path import DISTILLED_PATH, FastPathScorer
+from mmap_model import mapped_pipeline
+from prob_calibration import CalibratedPipeline, calibrated
+
+GOLDEN_PATH = "golden_set.csv"
+# Limits enforced by the app input forms, plus the inactive_flag boundary at 30/31 days.
+EDGE_VALUES = {
+    "age": [10, 100],
+    "watch_hours": [0.0, 168.0],
+    "last_login_days": [0, 30, 31, 365],
+    "avg_watch_time_per_day": [0.0, 24.0],
+    "number_of_profiles": [1, 5],
+    "no_of_devices": [1, 5],
+}
+
+
+def build_golden_set(sample=500, edge_base=10, seed=42):
+    customers = read_customers(DATA_PATH)
+    rows = [customers.sample(sample, random_state=seed)]
+    base = customers.sample(edge_base, random_state=seed + 1)
+    for col, values in EDGE_VALUES.items():
+        for value in values:
+            rows.append(base.assign(**{col: value}))
+    return pd.concat(rows, ignore_index=True)
+
+
+def load_golden_set(path=GOLDEN_PATH):
+    return pd.read_csv(path) if os.path.exists(path) else build_golden_set()
+
+
+# ----------------- Backends -----------------
+# name -> (factory(pipeline) returning a scorer df -> prob %,
+#          max abs diff in points or None for band-only, max golden rows or None for all)
+# `pipeline` may be a CalibratedPipeline; derived backends keep its calibration map.
+# A factory returns None when its backend does not apply to the model.
+def _derived(pipeline, derive):
+    if isinstance(pipeline, CalibratedPipeline):
+        derived = derive(pipeline.pipeline)
+        return None if derived is None else CalibratedPipeline(derived, pipeline.calibrator)
+    return derive(pipeline)
+
+
+def _reference(pipeline):
+    return lambda X: pipeline.predict_proba(X)[:, 1] * 100
+
+
+def _float32(pipeline):
+    fast = _derived(pipeline, float32_pipeline)
+    return lambda X: fast.predict_proba(to_float32(X))[:, 1] * 100
+
+
+def _fast_path(pipeline):
+    if not os.path.exists(DISTILLED_PATH):
+        return None
+    scorer = FastPathScorer.load(pipeline)
+    return lambda X: scorer.score_frame(X)[0]
+
+
+def _mapped_forest(pipeline):
+    mapped = _derived(pipeline, mapped_pipeline)
+    if mapped is None:  # not a forest, e.g. the train_hgb.py artifact
+        return None
+    return lambda X: mapped.predict_proba(X)[:, 1] * 100
+
+
+def _coded(pipeline):
+    coded = _derived(pipeline, coded_pipeline)
+    return lambda X: coded.predict_proba(X)[:, 1] * 100
+
+
+def _single_row(pipeline):
+    # The apps score one 1-row DataFrame per submit.
+    return lambda X: np.array([pipeline.predict_proba(X.iloc[[i]])[:, 1][0] * 100 for i in range(len(X))])
+
+
+BACKENDS = {
+    # One model call per row is slow; an evenly spread subset keeps the gate quick.
+    "single_row": (_single_row, 1e-9, 64),
+    # Band-only: float32 preprocessing rounds a few values across a tree split,
+    # flipping one tree's vote (100 / n_estimators points, more after a steep
+    # calibration step), so any point bound is either loose or flaky. What must
+    # not move is the side of a cut-off.
+    "float32": (_float32, None, None),
+    "fast_path": (_fast_path, None, None),
+    "mapped_forest": (_mapped_forest, 1e-9, None),
+    "coded": (_coded, 1e-9, None),
+}
+
+
+def run_parity(pipeline, golden=None, backends=None, model_path=None):
+    """Parity rows per backend; `passed` is False on drift over tolerance or band mismatches.
+
+    With `model_path`, scores go through the calibration map fitted for that artifact, if any.
+    """
+    golden = load_golden_set() if golden is None else golden
+    if model_path is not None:
+        pipeline = calibrated(pipeline, model_path)
+    reference = _reference(pipeline)(golden)
+    report = []
+    for name in backends or BACKENDS:
+        factory, tolerance, max_rows = BACKENDS[name]
+        scorer = factory(pipeline)
+        if scorer is None:
+            report.append({"backend": name, "skipped": True})
+            continue
+        rows = np.arange(len(golden))
+        if max_rows is not None and max_rows < len(golden):
+            rows = np.linspace(0, len(golden) - 1, max_rows).astype(int)
+        prob = scorer(golden.iloc[rows])
+        diff = np.abs(prob - reference[rows])
+        mismatches = int((cutoff_band(prob) != cutoff_band(reference[rows])).sum())
+        report.append({
+            "backend": name,
+            "rows": len(rows),
+            "max_abs_diff": float(diff.max()),
+            "mean_abs_diff": float(diff.mean()),
+            "band_mismatches": mismatches,
+            "passed": mismatches == 0 and (tolerance is None or diff.max() <= tolerance),
+        })
+    return report
+
+
+def print_report(report):
+    for row in report:
+        if row.get("skipped"):
+            print(f"{row['backend']:<14} skipped (not available for this model)")
+            continue
+        status = "ok" if row["passed"] else "FAIL"
+        print(f"{row['backend']:<14} {status:<5} max |diff| {row['max_abs_diff']:.4f} pts, "
+              f"mean {row['mean_abs_diff']:.4f}, band mismatches {row['band_mismatches']}/{row['rows']}")
+    return all(row.get("passed", True) for row in report)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check every scoring backend against the reference pipeline.")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="comma-separated subset of backends")
+    parser.add_argument("--write-golden", action="store_true", help=f"regenerate {GOLDEN_PATH} and exit")
+    args = parser.parse_args()
+
+    if args.write_golden:
+        build_golden_set().to_csv(GOLDEN_PATH, index=False)
+        print(f"Wrote {GOLDEN_PATH}")
+        return
+    report = run_parity(load_pipeline(args.model), backends=args.backends.split(","), model_path=args.model)
+    if not print_report(report):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
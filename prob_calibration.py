@@ -0,0 +1,190 @@
+# prob_calibration.py - Probability calibration table applied after the pipeline
+#
+# Forest probabilities are vote shares, not frequencies. `fit` maps them onto
+# observed churn rates with isotonic regression (or a Platt sigmoid) on one
+# part of a labelled file, and stores the map as a few knots in
+# NetflixChurn_calibration.json; applying it to a batch is one np.interp call.
+# The reliability curve before and after is reported on the rows the table
+# was not fitted on. The labelled file must be held out from the model's
+# training data: on in-sample rows (netflix_churn.csv for the shipped model)
+# the forest is nearly always right, the map collapses to a step and every
+# score would become 0 or 100. Such a map is refused by `fit` and ignored by
+# calibrated().
+#
+# Wherever the file exists and was fitted for the loaded model, app9.py,
+# scoring_service.py, score_batch.py, calibrate.py and `fast_path.py distill`
+# score through it. Re-run calibrate.py and fast_path.py distill after a refit.
+#
+#   python prob_calibration.py fit holdout.csv                  # isotonic, half of holdout.csv kept for the report
+#   python prob_calibration.py fit holdout.csv --method platt
+#   python prob_calibration.py report customers_labelled.csv
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from sklearn.isotonic import IsotonicRegression
+from sklearn.linear_model import LogisticRegression
+
+from churn_pipeline import DATA_PATH, MODEL_PATH, load_pipeline, read_customers
+from model_registry import file_version
+
+CALIBRATION_PATH = "NetflixChurn_calibration.json"
+TARGET = "churned"
+PLATT_KNOTS = 201
+# A usable map has at least MIN_LEVELS distinct outputs and sends at least
+# MIN_SPREAD of the raw 0-1 range strictly between 1% and 99%.
+MIN_LEVELS = 5
+MIN_SPREAD = 0.25
+
+
+class Calibrator:
+    """Piecewise-linear map from raw to calibrated churn probability (both 0-1)."""
+
+    def __init__(self, x, y, method, model_sha=None):
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.method = method
+        self.model_sha = model_sha
+
+    @classmethod
+    def fit(cls, prob, y, method="isotonic", model_sha=None):
+        if method == "isotonic":
+            iso = IsotonicRegression(y_min=0.0, y_max=1.0, out_of_bounds="clip").fit(prob, y)
+            return cls(iso.X_thresholds_, iso.y_thresholds_, method, model_sha)
+        if method == "platt":
+            eps = 1e-6
+            logit = lambda p: np.log(np.clip(p, eps, 1 - eps) / np.clip(1 - p, eps, 1 - eps))  # noqa: E731
+            lr = LogisticRegression(C=1e6).fit(logit(np.asarray(prob))[:, None], y)
+            x = np.linspace(0, 1, PLATT_KNOTS)
+            return cls(x, lr.predict_proba(logit(x)[:, None])[:, 1], method, model_sha)
+        raise ValueError(f"unknown calibration method {method!r}")
+
+    def apply(self, prob):
+        # Outside the fitted range the end knots hold, like IsotonicRegression(out_of_bounds="clip").
+        return np.interp(prob, self.x, self.y)
+
+    def collapsed(self):
+        """Reason the map is a near-step (typical of an in-sample fit), or None if it is usable."""
+        levels = len(np.unique(np.round(self.y, 6)))
+        grid = self.apply(np.linspace(0, 1, 101))
+        spread = float(np.mean((grid > 0.01) & (grid < 0.99)))
+        if levels < MIN_LEVELS:
+            return f"only {levels} distinct calibrated values (need {MIN_LEVELS})"
+        if spread < MIN_SPREAD:
+            return f"only {spread:.0%} of raw scores map between 1% and 99% (need {MIN_SPREAD:.0%})"
+        return None
+
+    def save(self, path=CALIBRATION_PATH):
+        with open(path, "w") as f:
+            json.dump({"method": self.method, "model_sha": self.model_sha,
+                       "x": self.x.tolist(), "y": self.y.tolist()}, f)
+
+    @classmethod
+    def load(cls, path=CALIBRATION_PATH):
+        with open(path) as f:
+            table = json.load(f)
+        return cls(table["x"], table["y"], table["method"], table.get("model_sha"))
+
+
+class CalibratedPipeline:
+    """A fitted pipeline whose predict_proba goes through a Calibrator; everything else is passed through."""
+
+    def __init__(self, pipeline, calibrator):
+        self.pipeline = pipeline
+        self.calibrator = calibrator
+
+    def predict_proba(self, X):
+        p = self.calibrator.apply(self.pipeline.predict_proba(X)[:, 1])
+        return np.column_stack([1 - p, p])
+
+    def predict(self, X):
+        return self.pipeline.classes_[(self.predict_proba(X)[:, 1] >= 0.5).astype(int)]
+
+    def __getattr__(self, name):
+        if name.startswith("__"):  # copy / pickle probes, looked up before __dict__ is restored
+            raise AttributeError(name)
+        return getattr(self.pipeline, name)
+
+
+def calibrated(pipeline, model_path=None, path=CALIBRATION_PATH):
+    """`pipeline` wrapped in the saved calibration, or unchanged if there is none for this model."""
+    if not os.path.exists(path):
+        return pipeline
+    calibrator = Calibrator.load(path)
+    if calibrator.collapsed():
+        return pipeline  # fitted on the model's own training rows; would turn scores into 0 / 100
+    if model_path is not None and calibrator.model_sha not in (None, file_version(model_path)[2]):
+        return pipeline  # fitted for another artifact (e.g. before a hot-swap)
+    return CalibratedPipeline(pipeline, calibrator)
+
+
+# ----------------- Reliability -----------------
+def reliability(prob, y, bins=10):
+    """Mean predicted vs observed churn rate per equal-width probability bin."""
+    idx = np.minimum((np.asarray(prob) * bins).astype(int), bins - 1)
+    rows = np.bincount(idx, minlength=bins)
+    with np.errstate(invalid="ignore"):
+        return pd.DataFrame({
+            "bin": [f"{i / bins:.1f}-{(i + 1) / bins:.1f}" for i in range(bins)],
+            "rows": rows,
+            "predicted": np.bincount(idx, weights=prob, minlength=bins) / rows,
+            "observed": np.bincount(idx, weights=y, minlength=bins) / rows,
+        })
+
+
+def calibration_error(prob, y, bins=10):
+    """(expected calibration error, Brier score)."""
+    table = reliability(prob, y, bins)
+    gap = (table["predicted"] - table["observed"]).abs().fillna(0)
+    return float((gap * table["rows"]).sum() / len(prob)), float(np.mean((np.asarray(prob) - y) ** 2))
+
+
+def _print_comparison(raw, cal, y, bins):
+    before, after = reliability(raw, y, bins), reliability(cal, y, bins)
+    table = before.merge(after, on="bin", suffixes=("_raw", "_calibrated"))
+    print(table.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+    for label, prob in (("raw", raw), ("calibrated", cal)):
+        ece, brier = calibration_error(prob, y, bins)
+        print(f"{label:>10}: ECE {ece:.4f}  Brier {brier:.4f}")
+
+
+# ----------------- CLI -----------------
+def main():
+    parser = argparse.ArgumentParser(description="Fit and check the probability calibration table.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    fit = sub.add_parser("fit", help=f"write {CALIBRATION_PATH}")
+    fit.add_argument("data", help=f"labelled CSV held out from the model's training data (needs '{TARGET}')")
+    fit.add_argument("--method", choices=["isotonic", "platt"], default="isotonic")
+    fit.add_argument("--holdout", type=float, default=0.5, help="share of rows kept back for the reliability report")
+    fit.add_argument("--seed", type=int, default=42)
+    rep = sub.add_parser("report", help="reliability of raw vs calibrated probabilities on a labelled file")
+    rep.add_argument("data", nargs="?", default=DATA_PATH)
+    for p in (fit, rep):
+        p.add_argument("--model", default=MODEL_PATH)
+        p.add_argument("--bins", type=int, default=10)
+    args = parser.parse_args()
+
+    y = pd.read_csv(args.data, usecols=[TARGET])[TARGET].to_numpy()
+    raw = load_pipeline(args.model).predict_proba(read_customers(args.data))[:, 1]
+    if args.command == "report":
+        _print_comparison(raw, Calibrator.load().apply(raw), y, args.bins)
+        return
+
+    held_out = np.random.default_rng(args.seed).random(len(y)) < args.holdout
+    calibrator = Calibrator.fit(raw[~held_out], y[~held_out], args.method, file_version(args.model)[2])
+    reason = calibrator.collapsed()
+    if reason:
+        _print_comparison(raw[held_out], calibrator.apply(raw[held_out]), y[held_out], args.bins)
+        sys.exit(f"Not writing {CALIBRATION_PATH}: the map collapsed to a step ({reason}). "
+                 f"Is {args.data} part of the model's training data?")
+    calibrator.save()
+    print(f"Wrote {CALIBRATION_PATH} ({args.method}, {len(calibrator.x)} knots, "
+          f"fitted on {(~held_out).sum()} rows); reliability on the {held_out.sum()} held-out rows:")
+    _print_comparison(raw[held_out], calibrator.apply(raw[held_out]), y[held_out], args.bins)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+# region_shards.py - One pipeline per region, loaded on first use under a memory budget
+#
+# `train` fits a copy of the global pipeline (same steps and hyper-parameters)
+# on each region's customers and writes region_shards/<region>.pkl plus
+# manifest.json. With a hold-out share it first compares shard and global AUC
+# on each region's held-out rows; a shard that doesn't beat the global model
+# is written but marked not to be served. Regions without a served shard
+# (too few rows, unseen region) are scored by the global model.
+#
+# The global calibration table (prob_calibration.py) belongs to the global
+# model. Each shard gets its own, <region>.calibration.json, fitted on the
+# shard's scores for its held-out rows; the manifest records which shards have
+# one. Without a hold-out share, or when the map collapses, a shard's scores
+# stay raw.
+#
+# ShardRegistry loads a shard the first time its region is scored and keeps
+# the most recently used ones while their file sizes (from the manifest) fit --budget-mb,
+# evicting the least recently used first. score_frame() sorts a batch by
+# region so every shard scores one contiguous block in one predict_proba call.
+#
+#   python region_shards.py train                         # netflix_churn.csv, 20% held out per region
+#   python region_shards.py train history.csv --min-rows 2000 --holdout 0
+#   python region_shards.py score customers.csv --budget-mb 64
+#   python score_batch.py customers.csv --shards region_shards
+import argparse
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.metrics import roc_auc_score
+
+from churn_pipeline import DATA_PATH, MODEL_PATH, feature_frame, load_pipeline, warm_up
+from model_registry import file_version
+from prob_calibration import CALIBRATION_PATH, Calibrator, calibrated
+
+SHARDS_DIR = "region_shards"
+MANIFEST = "manifest.json"
+SHARD_KEY = "region"
+TARGET = "churned"
+
+
+def shard_file(region):
+    return "".join(c if c.isalnum() else "_" for c in region.lower()) + ".pkl"
+
+
+def calibration_for(path):
+    """Calibration table for an artifact: a shard's own if it has one, else the global table.
+
+    calibrated() ignores a table fitted for another artifact, so a shard without
+    its own table is scored raw rather than through the global model's map.
+    """
+    own = os.path.splitext(path)[0] + ".calibration.json"
+    return own if os.path.exists(own) else CALIBRATION_PATH
+
+
+def load_calibrated(path):
+    return calibrated(load_pipeline(path), path, calibration_for(path))
+
+
+# ----------------- Training -----------------
+def _auc(y, prob):
+    return float(roc_auc_score(y, prob)) if len(np.unique(y)) == 2 else None
+
+
+def train_shards(df, base, out_dir=SHARDS_DIR, min_rows=300, holdout=0.2, seed=42):
+    """Fit and write one clone of `base` per region; returns the manifest."""
+    os.makedirs(out_dir, exist_ok=True)
+    X, y = feature_frame(df), df[TARGET].to_numpy()
+    held_out = np.random.default_rng(seed).random(len(df)) < holdout
+    # The global model is refitted on the same training rows so the comparison is fair.
+    global_prob = clone(base).fit(X[~held_out], y[~held_out]).predict_proba(X)[:, 1] if holdout else None
+    shards = {}
+    for region, rows in df.groupby(SHARD_KEY).indices.items():
+        info = {"rows": int(len(rows)), "file": None, "serve": False}
+        if len(rows) >= min_rows:
+            if holdout:
+                fit, test = rows[~held_out[rows]], rows[held_out[rows]]
+                shard_prob = clone(base).fit(X.iloc[fit], y[fit]).predict_proba(X.iloc[test])[:, 1]
+                info["auc_shard"] = _auc(y[test], shard_prob)
+                info["auc_global"] = _auc(y[test], global_prob[test])
+            info["file"] = shard_file(region)
+            path = os.path.join(out_dir, info["file"])
+            joblib.dump(clone(base).fit(X.iloc[rows], y[rows]), path)
+            # The registry budgets shards by this size, so it never re-pickles a pipeline to measure it.
+            info["mb"] = round(os.path.getsize(path) / 2**20, 3)
+            info["serve"] = not holdout or (info["auc_shard"] or 0) >= (info["auc_global"] or 0)
+            info["calibrated"] = _calibrate(path, shard_prob if holdout else None, y[test] if holdout else None)
+        shards[region] = info
+    manifest = {"key": SHARD_KEY, "min_rows": min_rows, "holdout": holdout, "shards": shards}
+    with open(os.path.join(out_dir, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def _calibrate(path, prob, y):
+    # `prob`: held-out scores of the shard fitted without those rows. The served shard is
+    # refit on all rows; the map is kept only if it isn't a step (see prob_calibration.py).
+    own = os.path.splitext(path)[0] + ".calibration.json"
+    if os.path.exists(own):
+        os.remove(own)  # an earlier train's table, fitted for the artifact just replaced
+    if prob is None or len(np.unique(y)) < 2:
+        return False
+    calibrator = Calibrator.fit(prob, y, model_sha=file_version(path)[2])
+    if calibrator.collapsed():
+        return False
+    calibrator.save(own)
+    return True
+
+
+# ----------------- Serving -----------------
+class ShardRegistry:
+    """Lazily loaded per-region pipelines with LRU eviction; the global pipeline is always resident."""
+
+    def __init__(self, directory=SHARDS_DIR, fallback_path=MODEL_PATH, budget_mb=256.0, loader=load_calibrated,
+                 warmup=warm_up):
+        with open(os.path.join(directory, MANIFEST)) as f:
+            manifest = json.load(f)
+        self.directory = directory
+        self.key = manifest["key"]
+        self.files = {region: info["file"] for region, info in manifest["shards"].items() if info["serve"]}
+        self.sizes = {region: manifest["shards"][region].get("mb") or os.path.getsize(os.path.join(directory, f)) / 2**20
+                      for region, f in self.files.items()}
+        self.budget_mb = budget_mb
+        self.loader = loader
+        self.warmup = warmup
+        self.fallback = loader(fallback_path)
+        self.fallback_version = file_version(fallback_path)[2]
+        self._loaded = OrderedDict()  # region -> (pipeline, MB), least recently used first
+        self._lock = threading.Lock()
+        self.loads = self.evictions = self.hits = 0
+
+    def get(self, region):
+        """Pipeline for a region (its shard if one is served, else the global one)."""
+        if region not in self.files:
+            return self.fallback
+        with self._lock:
+            if region in self._loaded:
+                self._loaded.move_to_end(region)
+                self.hits += 1
+                return self._loaded[region][0]
+            # Loading under the lock: two requests for a cold shard must not both read it.
+            pipeline = self.loader(os.path.join(self.directory, self.files[region]))
+            self.warmup(pipeline)
+            self._loaded[region] = (pipeline, self.sizes[region])
+            self.loads += 1
+            while len(self._loaded) > 1 and self.resident_mb() > self.budget_mb:
+                self._loaded.popitem(last=False)
+                self.evictions += 1
+            return pipeline
+
+    def resident_mb(self):
+        return sum(mb for _, mb in self._loaded.values())
+
+    def stats(self):
+        return {
+            "fallback_version": self.fallback_version,
+            "served_shards": len(self.files),
+            "loaded": list(self._loaded),
+            "resident_mb": round(self.resident_mb(), 1),
+            "budget_mb": self.budget_mb,
+            "loads": self.loads,
+            "hits": self.hits,
+            "evictions": self.evictions,
+        }
+
+
+def score_frame(registry, X):
+    """Churn probability (0-1) per row; rows are grouped by region so each pipeline gets one contiguous batch."""
+    keys = X[registry.key].fillna("").astype(str).to_numpy()
+    order = np.argsort(keys, kind="stable")
+    starts = np.r_[0, np.flatnonzero(keys[order][1:] != keys[order][:-1]) + 1, len(order)]
+    prob = np.empty(len(X))
+    for start, stop in zip(starts[:-1], starts[1:]):
+        rows = order[start:stop]
+        prob[rows] = registry.get(keys[rows[0]]).predict_proba(X.iloc[rows])[:, 1]
+    return prob
+
+
+# ----------------- CLI -----------------
+def main():
+    parser = argparse.ArgumentParser(description="Train and score per-region model shards.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    trn = sub.add_parser("train", help=f"write {SHARDS_DIR}/<region>.pkl and {MANIFEST}")
+    trn.add_argument("data", nargs="?", default=DATA_PATH, help=f"labelled CSV (needs '{TARGET}')")
+    trn.add_argument("--min-rows", type=int, default=300, help="regions with fewer rows use the global model")
+    trn.add_argument("--holdout", type=float, default=0.2, help="share of rows held out to compare AUC (0: skip)")
+    trn.add_argument("--seed", type=int, default=42)
+    scr = sub.add_parser("score", help="score a CSV through the shards and report loads / evictions")
+    scr.add_argument("data", nargs="?", default=DATA_PATH)
+    scr.add_argument("--budget-mb", type=float, default=256.0)
+    for p in (trn, scr):
+        p.add_argument("--model", default=MODEL_PATH, help="global pipeline (template for train, fallback for score)")
+        p.add_argument("--dir", default=SHARDS_DIR)
+    args = parser.parse_args()
+
+    if args.command == "train":
+        start = time.perf_counter()
+        manifest = train_shards(pd.read_csv(args.data), load_pipeline(args.model), args.dir, args.min_rows,
+                                args.holdout, args.seed)
+        print(pd.DataFrame(manifest["shards"]).T.to_string(float_format=lambda v: f"{v:.4f}"))
+        served = [info for info in manifest["shards"].values() if info["serve"]]
+        print(f"Wrote {args.dir}/ in {time.perf_counter() - start:.1f}s; "
+              f"{len(served)} of {len(manifest['shards'])} regions served by their own shard, "
+              f"{sum(info['calibrated'] for info in served)} of them with their own calibration table")
+        return
+    registry = ShardRegistry(args.dir, args.model, args.budget_mb)
+    X = feature_frame(pd.read_csv(args.data))
+    start = time.perf_counter()
+    prob = score_frame(registry, X)
+    print(f"Scored {len(X)} rows in {time.perf_counter() - start:.2f}s, mean churn probability {prob.mean():.3f}")
+    print(json.dumps(registry.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
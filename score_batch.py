@@ -0,0 +1,110 @@
+# score_batch.py - Score a customer file in chunks with the churn pipeline
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from churn_pipeline import (
+    MODEL_PATH, coded_pipeline, cutoff_band, feature_frame, float32_pipeline, load_pipeline, risk_band, to_float32,
+)
+from drift import DriftMonitor
+from metrics import BATCH_ROWS_PER_SECOND, LATENCY, PREDICTIONS, write_textfile
+from prob_calibration import calibrated
+from region_shards import ShardRegistry, calibration_for, score_frame as score_sharded
+
+
+def score_frame(pipeline, df, float32=False):
+    """Churn probability in percent for every row of `df`."""
+    X = feature_frame(df)
+    if float32:
+        X = to_float32(X)
+    return pipeline.predict_proba(X)[:, 1] * 100
+
+
+def parity_report(pipeline, fast_pipeline, df):
+    """Probability drift of the float32 path against the float64 reference."""
+    reference = score_frame(pipeline, df)
+    fast = score_frame(fast_pipeline, df, float32=True)
+    diff = np.abs(fast - reference)
+    return {
+        "rows": len(df),
+        "max_abs_diff_pct": float(diff.max()),
+        "mean_abs_diff_pct": float(diff.mean()),
+        "p99_abs_diff_pct": float(np.quantile(diff, 0.99)),
+        "band_mismatches": int((cutoff_band(fast) != cutoff_band(reference)).sum()),
+    }
+
+
+# ----------------- CLI -----------------
+def main():
+    parser = argparse.ArgumentParser(description="Batch-score customers for churn risk.")
+    parser.add_argument("input", help="CSV with the 12 model inputs (extra columns are kept)")
+    parser.add_argument("--out", default="scored_customers.csv")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--float32", action="store_true", help="keep features in float32 end to end")
+    parser.add_argument("--coded", action="store_true",
+                        help="one integer code per categorical instead of one-hot columns (same scores, less memory)")
+    parser.add_argument("--shards", help="score each region with its shard from this directory (see region_shards.py)")
+    parser.add_argument("--shard-budget-mb", type=float, default=256.0, help="memory budget for loaded shards")
+    parser.add_argument("--parity", action="store_true", help="report float32 drift against float64 and exit")
+    parser.add_argument("--drift-state", help="add this file's input counts to a drift state file (see drift.py)")
+    parser.add_argument("--metrics-file", help="write Prometheus metrics here when done (textfile collector)")
+    args = parser.parse_args()
+
+    pipeline = load_pipeline(args.model)
+    if args.parity:
+        df = pd.read_csv(args.input)
+        for key, value in parity_report(pipeline, float32_pipeline(pipeline), df).items():
+            print(f"{key}: {value}")
+        return
+
+    def prepare(pipeline, path):
+        # Same treatment for the global model and every region shard; each goes
+        # through its own calibration table, and is scored raw if it has none.
+        if args.float32:
+            pipeline = float32_pipeline(pipeline)
+        if args.coded:
+            pipeline = coded_pipeline(pipeline)
+        return calibrated(pipeline, path, calibration_for(path))
+
+    pipeline = prepare(pipeline, args.model)
+    shards = None
+    if args.shards:
+        shards = ShardRegistry(args.shards, args.model, args.shard_budget_mb,
+                               loader=lambda path: prepare(load_pipeline(path), path))
+
+    drift = DriftMonitor.from_baseline().load_state(args.drift_state) if args.drift_state else None
+    start, rows = time.perf_counter(), 0
+    header = True
+    for chunk in pd.read_csv(args.input, chunksize=args.chunksize):
+        chunk_start = time.perf_counter()
+        if shards is not None:
+            X = feature_frame(chunk)
+            prob = score_sharded(shards, to_float32(X) if args.float32 else X) * 100
+        else:
+            prob = score_frame(pipeline, chunk, float32=args.float32)
+        LATENCY.labels(path="batch").observe(time.perf_counter() - chunk_start)
+        PREDICTIONS.labels(path="batch").inc(len(chunk))
+        if drift is not None:
+            drift.update(chunk)
+        chunk["churn_prob"] = np.round(prob, 2)
+        chunk["risk_band"] = risk_band(prob)
+        chunk.to_csv(args.out, mode="w" if header else "a", header=header, index=False)
+        header = False
+        rows += len(chunk)
+    elapsed = time.perf_counter() - start
+    BATCH_ROWS_PER_SECOND.labels(job=os.path.basename(args.input)).set(rows / max(elapsed, 1e-9))
+    if args.metrics_file:
+        write_textfile(args.metrics_file)
+    if drift is not None:
+        drift.save(args.drift_state)
+    if shards is not None:
+        print(f"Shards: {shards.stats()}")
+    print(f"Scored {rows} rows in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s) -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+# scoring_service.py - JSON HTTP API for churn scoring
+#
+#   POST /predict   {"age": 51, "gender": "Other", ...} or a list of such records
+#   GET  /stats     request totals, model version / swaps, pool load, fast-path counters
+#   GET  /metrics   Prometheus text format (metrics.py)
+#   GET  /drift     PSI / KS of the inputs seen so far vs the training baseline (drift.py)
+#   GET  /health
+#
+# Requests are scored on a fixed thread pool that shares one model; the tree
+# code releases the GIL, so model calls on different threads overlap. When
+# the pool's backlog is full new requests get 503 instead of queueing forever.
+import argparse
+import copy
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from sklearn.pipeline import Pipeline
+
+from churn_pipeline import MODEL_PATH, float32_pipeline, load_pipeline, records_frame, risk_band, to_float32
+from audit_log import AUDIT_PATH, AuditLog
+from drift import DriftMonitor
+from fast_path import DISTILLED_PATH, FastPathScorer
+from metrics import CONTENT_TYPE, LATENCY, PREDICTIONS, render
+from mmap_model import load_mapped
+from model_registry import ModelRegistry
+from prob_calibration import calibrated
+
+
+# ----------------- Concurrency -----------------
+class Overloaded(Exception):
+    """The scoring backlog is full; the HTTP layer answers 503."""
+
+
+class ScoringPool:
+    """Thread pool with a bounded backlog.
+
+    At most `workers + queue_size` jobs are admitted at once. Beyond that,
+    submit() waits up to `timeout` seconds for a slot and then raises
+    Overloaded, so callers see backpressure instead of unbounded latency.
+    """
+
+    def __init__(self, workers=None, queue_size=None, timeout=0.0):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = 4 * self.workers if queue_size is None else queue_size
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_size)
+        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="scoring")
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def submit(self, fn, *args):
+        admitted = self._slots.acquire(timeout=self.timeout) if self.timeout > 0 else self._slots.acquire(False)
+        with self._lock:
+            if not admitted:
+                self.rejected += 1
+                raise Overloaded(f"{self.in_flight} requests in flight")
+            self.in_flight += 1
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+        self._slots.release()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+    def stats(self):
+        return {"workers": self.workers, "queue_size": self.queue_size, "in_flight": self.in_flight,
+                "completed": self.completed, "rejected": self.rejected}
+
+
+def single_threaded(pipeline):
+    """Same pipeline with the model's own n_jobs parallelism off; the fitted trees are shared.
+
+    The pool already runs one model call per core, so a forest fitted with
+    n_jobs=-1 would otherwise start a thread per core for every request.
+    """
+    name, model = pipeline.steps[-1]
+    if hasattr(model, "n_jobs"):
+        model = copy.copy(model)
+        model.n_jobs = 1
+    return Pipeline(pipeline.steps[:-1] + [(name, model)])
+
+
+# ----------------- Service -----------------
+class ScoringService:
+    def __init__(self, model_path=MODEL_PATH, fast_path=None, float32=False, poll_interval=5.0, mmap=False,
+                 workers=None, queue_size=None, queue_timeout=0.0, audit_path=AUDIT_PATH):
+        self.float32 = float32
+        self.pool = ScoringPool(workers, queue_size, queue_timeout)
+        self.audit = AuditLog(audit_path).start() if audit_path else None
+        self.drift = DriftMonitor.from_baseline()
+
+        def scoring(pipeline):
+            # Calibration table (prob_calibration.py) applied after the pipeline when one exists for this model.
+            return calibrated(single_threaded(float32_pipeline(pipeline) if float32 else pipeline), model_path)
+
+        extras = {"scoring": scoring}
+        if fast_path:
+            extras["fast_scorer"] = lambda pipeline: FastPathScorer.load(scoring(pipeline), fast_path, model_path)
+        # Swapped atomically when the artifact changes; see model_registry.py.
+        # With mmap the model arrays are file-backed pages shared by every worker on the host.
+        loader = load_mapped if mmap else load_pipeline
+        self.registry = ModelRegistry(model_path, extras=extras, poll_interval=poll_interval, loader=loader).start()
+
+    def predict(self, records):
+        """Score a list of input dicts on the pool; raises Overloaded when the backlog is full."""
+        return self.pool.submit(self._predict, records).result()
+
+    def _predict(self, records):
+        start = time.perf_counter()
+        snapshot = self.registry.current
+        fast_scorer = snapshot.extras.get("fast_scorer")
+        if fast_scorer is not None and len(records) == 1:
+            prob, path = fast_scorer.score_record(records[0])
+            prob, paths = np.array([prob]), [path]
+        else:
+            X = records_frame(records)
+            if self.float32:
+                X = to_float32(X)
+            if fast_scorer is not None:
+                prob, paths = fast_scorer.score_frame(X)
+            else:
+                prob, paths = snapshot.extras["scoring"].predict_proba(X)[:, 1] * 100, ["full"] * len(X)
+        results = [
+            {"churn_prob": round(float(p), 2), "risk_band": str(band), "path": str(path)}
+            for p, band, path in zip(prob, risk_band(prob), paths)
+        ]
+        LATENCY.labels(path="api").observe(time.perf_counter() - start)
+        PREDICTIONS.labels(path="api").inc(len(results))
+        for record in records:
+            self.drift.update_record(record)
+        if self.audit is not None:
+            for record, result in zip(records, results):
+                self.audit.record(record, result["churn_prob"], result["risk_band"], snapshot.version[2])
+        return results
+
+    def stats(self):
+        stats = {"float32": self.float32, "pool": self.pool.stats(), **self.registry.stats()}
+        if self.audit is not None:
+            stats["audit"] = self.audit.stats()
+        fast_scorer = self.registry.current.extras.get("fast_scorer")
+        if fast_scorer is not None:
+            stats["paths"] = fast_scorer.stats()
+        return stats
+
+
+# ----------------- HTTP Layer -----------------
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, payload, retry_after=None, content_type="application/json"):
+            body = payload.encode() if isinstance(payload, str) else json.dumps(payload).encode()
+            self.send_response(status)
+            if retry_after is not None:
+                self.send_header("Retry-After", str(retry_after))
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send(200, {"status": "ok"})
+            elif self.path == "/stats":
+                self._send(200, service.stats())
+            elif self.path == "/drift":
+                # to_json turns NaN (nothing seen yet, KS of categoricals) into null
+                self._send(200, service.drift.report().to_json(orient="records"))
+            elif self.path == "/metrics":
+                self._send(200, render(), content_type=CONTENT_TYPE)
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/predict":
+                self._send(404, {"error": "not found"})
+                return
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                records = payload if isinstance(payload, list) else [payload]
+                if not records or not all(isinstance(record, dict) for record in records):
+                    raise ValueError("expected a JSON object or a non-empty list of objects")
+                self._send(200, {"predictions": service.predict(records)})
+            except Overloaded as e:
+                self._send(503, {"error": f"overloaded: {e}"}, retry_after=1)
+            except (ValueError, KeyError) as e:
+                self._send(400, {"error": str(e)})
+            except Exception as e:
+                # Anything else is a scoring bug; answer instead of dropping the connection.
+                self._send(500, {"error": f"{type(e).__name__}: {e}"})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve churn predictions over HTTP.")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--fast-path", nargs="?", const=DISTILLED_PATH, default=None,
+                        help="answer confident cases from the distilled model (default file: %(const)s)")
+    parser.add_argument("--float32", action="store_true", help="keep features in float32 end to end")
+    parser.add_argument("--poll-interval", type=float, default=5.0, help="seconds between model file checks")
+    parser.add_argument("--workers", type=int, default=None, help="scoring threads (default: one per core)")
+    parser.add_argument("--queue-size", type=int, default=None,
+                        help="requests allowed to wait for a thread before answering 503 (default: 4 per worker)")
+    parser.add_argument("--queue-timeout", type=float, default=0.0,
+                        help="seconds a request may wait for a queue slot before 503")
+    parser.add_argument("--audit-log", default=AUDIT_PATH, help="audit log file, {pid} is replaced by the process id; one file per process ('' to disable)")
+    parser.add_argument("--mmap", action="store_true",
+                        help="memory-map the model (an artifact written by `python mmap_model.py export`)")
+    args = parser.parse_args()
+
+    if args.fast_path and not os.path.exists(args.fast_path):
+        parser.error(f"{args.fast_path} not found; run `python fast_path.py distill` first")
+    service = ScoringService(args.model, fast_path=args.fast_path, float32=args.float32,
+                             poll_interval=args.poll_interval, mmap=args.mmap, workers=args.workers,
+                             queue_size=args.queue_size, queue_timeout=args.queue_timeout,
+                             audit_path=args.audit_log)
+    # Connection threads only wait on the pool; the pool bounds how much scoring runs at once.
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    print(f"Serving churn predictions on http://{args.host}:{args.port} with {service.pool.workers} scoring threads")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# segment_cube.py - Precompute churn by segment and partial-dependence curves
+#
+# `python segment_cube.py` scores netflix_churn.csv once and stores
+#   * a cube of row count, mean predicted and mean observed churn for every
+#     region x subscription_type x device x payment_method combination, and
+#   * partial-dependence curves for the numeric inputs,
+# so dashboard.py can slice everything in memory without calling the model.
+import argparse
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from churn_pipeline import DATA_PATH, MODEL_PATH, NUMERIC_COLS, feature_frame, load_pipeline
+
+CUBE_PATH = "segment_cube.pkl"
+SEGMENT_DIMS = ["region", "subscription_type", "device", "payment_method"]
+
+
+def build_cube(pipeline, df):
+    scored = df[SEGMENT_DIMS].copy()
+    scored["predicted"] = pipeline.predict_proba(feature_frame(df))[:, 1]
+    scored["observed"] = df["churned"]
+    cube = scored.groupby(SEGMENT_DIMS, observed=True).agg(
+        customers=("predicted", "size"),
+        predicted=("predicted", "mean"),
+        observed=("observed", "mean"),
+    )
+    return cube.reset_index()
+
+
+def partial_dependence(pipeline, X, grid_points=20, sample=1000, seed=0):
+    """Mean predicted churn with one numeric input forced to each grid value."""
+    base = X.sample(min(sample, len(X)), random_state=seed)
+    curves = {}
+    for col in NUMERIC_COLS:
+        grid = np.unique(np.quantile(X[col].dropna(), np.linspace(0, 1, grid_points)))
+        # All grid copies of the sample go through the pipeline in one call.
+        stacked = pd.concat([base.assign(**{col: value}) for value in grid], ignore_index=True)
+        prob = pipeline.predict_proba(stacked)[:, 1].reshape(len(grid), len(base))
+        curves[col] = pd.DataFrame({col: grid, "predicted": prob.mean(axis=1)})
+    return curves
+
+
+def slice_cube(cube, filters=None, by=None):
+    """Filter the cube on {dim: [values]} and roll it up to the `by` dimensions."""
+    view = cube
+    for dim, values in (filters or {}).items():
+        if values:
+            view = view[view[dim].isin(values)]
+    by = list(by or [])
+    weighted = view.assign(
+        predicted=view["predicted"] * view["customers"],
+        observed=view["observed"] * view["customers"],
+    )
+    if by:
+        rolled = weighted.groupby(by, observed=True)[["customers", "predicted", "observed"]].sum().reset_index()
+    else:
+        rolled = weighted[["customers", "predicted", "observed"]].sum().to_frame().T
+    rolled["predicted"] /= rolled["customers"]
+    rolled["observed"] /= rolled["customers"]
+    return rolled
+
+
+def load_cube(path=CUBE_PATH):
+    return joblib.load(path)
+
+
+# ----------------- CLI -----------------
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the churn segment cube for dashboard.py.")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--out", default=CUBE_PATH)
+    parser.add_argument("--pd-sample", type=int, default=1000, help="rows used for partial-dependence curves")
+    args = parser.parse_args()
+
+    pipeline = load_pipeline(args.model)
+    df = pd.read_csv(args.data)
+    cube = build_cube(pipeline, df)
+    curves = partial_dependence(pipeline, feature_frame(df), sample=args.pd_sample)
+    joblib.dump({"cube": cube, "partial_dependence": curves}, args.out, compress=3)
+    print(f"Wrote {args.out}: {len(cube)} segments, {len(curves)} partial-dependence curves")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# session_record.py - Compact per-session profile and score for the Streamlit apps
+#
+# The Streamlit apps used to keep every submit in st.session_state as a 1-row
+# pandas DataFrame plus loose churn_prob / churn_color / churn_message keys
+# (app9.py also kept a DataFrame of the 10 nearest customers). A SessionRecord holds the same profile in a slotted
+# object: numerics as numbers, each categorical as a small int code into
+# VOCAB, the one process-wide tuple of (interned) level strings. Colour and
+# message are derived from the probability when shown, and the model frame is
+# rebuilt only when scoring.
+#
+#   python session_record.py measure --sessions 500     # per-session bytes, old layout vs record
+import argparse
+import sys
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from churn_pipeline import CATEGORICAL_COLS, DATA_PATH, FEATURE_COLUMNS, NUMERIC_COLS, records_frame
+
+# Level order is the apps' selectbox order, so widgets can list VOCAB[col] directly.
+VOCAB = {col: tuple(sys.intern(level) for level in levels) for col, levels in {
+    "gender": ["Male", "Female", "Other"],
+    "subscription_type": ["Basic", "Standard", "Premium"],
+    "region": ["South America", "Europe", "North America", "Asia", "Africa", "Oceania"],
+    "device": ["Tablet", "Laptop", "Mobile", "TV", "Desktop"],
+    "payment_method": ["Debit Card", "PayPal", "Crypto", "Gift Card", "Credit Card"],
+    "favorite_genre": ["Drama", "Documentary", "Romance", "Sci-Fi", "Horror", "Action", "Comedy"],
+}.items()}
+CODES = {col: {level: code for code, level in enumerate(levels)} for col, levels in VOCAB.items()}
+
+
+class SessionRecord:
+    """One submitted profile and its churn probability (percent, None until scored)."""
+
+    __slots__ = tuple(FEATURE_COLUMNS) + ("prob",)
+
+    def __init__(self, inputs, prob=None):
+        for col in NUMERIC_COLS:
+            setattr(self, col, inputs.get(col))
+        for col in CATEGORICAL_COLS:
+            setattr(self, col, CODES[col][inputs[col]])  # KeyError: not one of the form's levels
+        self.prob = prob
+
+    def inputs(self):
+        """The 12 inputs as the apps' user_input dict, categoricals decoded to the shared strings."""
+        return {col: VOCAB[col][getattr(self, col)] if col in VOCAB else getattr(self, col)
+                for col in FEATURE_COLUMNS}
+
+    def frame(self):
+        return records_frame([self.inputs()])
+
+    def __repr__(self):
+        return f"SessionRecord({self.inputs()!r}, prob={self.prob!r})"
+
+
+# ----------------- Memory Measurement -----------------
+def _fresh(value):
+    # Streamlit hands each session its own copy of a typed-in value.
+    return "".join(list(value)) if isinstance(value, str) else value
+
+
+def _submitted(row):
+    # The profile as the apps build it on submit: numbers parsed per session, levels from the widgets.
+    inputs = {col: type(row[col])(_fresh(str(row[col]))) for col in NUMERIC_COLS}
+    inputs.update({col: VOCAB[col][CODES[col][row[col]]] for col in CATEGORICAL_COLS})
+    return inputs
+
+
+def _widget_state(row):
+    state = {col: _fresh(str(row[col])) for col in ("age", "watch_hours", "last_login_days")}
+    state.update({col: VOCAB[col][CODES[col][row[col]]] for col in CATEGORICAL_COLS})
+    state["no_of_devices"] = int(row["no_of_devices"])
+    return state
+
+
+def old_session(row, prob):
+    return {
+        **_widget_state(row),
+        "churn_prob": round(prob, 2),
+        "churn_color": "red" if prob >= 75 else "orange" if prob >= 50 else "green",
+        "churn_message": "⚠ High Risk! Consider reaching out to the customer.",
+        "user_input": pd.DataFrame([_submitted(row)])[FEATURE_COLUMNS],
+    }
+
+
+def new_session(row, prob):
+    return {**_widget_state(row), "record": SessionRecord(_submitted(row), round(prob, 2))}
+
+
+def per_session_bytes(build, rows, probs):
+    """Average bytes allocated by one session's state under tracemalloc."""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    sessions = [build(row, prob) for row, prob in zip(rows, probs)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return allocated / len(sessions)
+
+
+# ----------------- CLI -----------------
+def main():
+    parser = argparse.ArgumentParser(description="Measure per-session state, loose keys + DataFrame vs SessionRecord.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    mea = sub.add_parser("measure", help="simulate many concurrent sessions with customers from a CSV")
+    mea.add_argument("--sessions", type=int, default=500)
+    mea.add_argument("--data", default=DATA_PATH)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.data).assign(no_of_devices=1)
+    df = df[np.all([df[col].isin(VOCAB[col]) for col in CATEGORICAL_COLS], axis=0)]
+    rows = df.sample(args.sessions, replace=len(df) < args.sessions, random_state=0).to_dict(orient="records")
+    probs = np.random.default_rng(0).random(len(rows)) * 100
+    old = per_session_bytes(old_session, rows, probs)
+    new = per_session_bytes(new_session, rows, probs)
+    print(f"{len(rows)} sessions: {old:,.0f} B/session with loose keys + DataFrame, "
+          f"{new:,.0f} B/session with SessionRecord ({old / new:.1f}x smaller, "
+          f"{(old - new) * len(rows) / 2**20:.1f} MB saved)")
+
+
+if __name__ == "__main__":
+    main()
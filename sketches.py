@@ -0,0 +1,94 @@
+# sketches.py - Mergeable summaries for fitting transformers out of core
+#
+# KLLSketch answers quantile queries over a stream in O(k log n) memory.
+# With the default k=200 the normalized rank error is about 1.3% at 99%
+# confidence (the figure Apache DataSketches publishes for the same k), and it
+# shrinks roughly as 1/k. Concretely, the value returned for q=0.01 has a true
+# rank somewhere between ~0.0 and ~0.023 of the data; use k=1000 for ~0.3%.
+# Rank error does not depend on n, so billions of rows cost the same memory.
+#
+# ModeCounter keeps exact per-category counts; it is exact as long as the
+# category vocabulary is small, which holds for every categorical input here.
+import numpy as np
+import pandas as pd
+
+
+class KLLSketch:
+    def __init__(self, k=200, seed=None):
+        self.k = k
+        self.n = 0
+        # compactors[h] holds items that each stand for 2**h original values.
+        self.compactors = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.compactors) - level - 1
+        return max(8, int(np.ceil(self.k * (2.0 / 3.0) ** depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.compactors):
+            items = self.compactors[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.compactors):
+                    self.compactors.append(np.empty(0))
+                items = np.sort(items)
+                # An odd leftover stays behind so total weight is preserved.
+                keep = items[-1:] if len(items) % 2 else items[:0]
+                paired = items[: len(items) - len(keep)]
+                promoted = paired[self._rng.integers(2)::2]
+                self.compactors[level] = keep
+                self.compactors[level + 1] = np.concatenate([self.compactors[level + 1], promoted])
+            level += 1
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self.n += len(values)
+        self.compactors[0] = np.concatenate([self.compactors[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append(np.empty(0))
+        for level, items in enumerate(other.compactors):
+            self.compactors[level] = np.concatenate([self.compactors[level], items])
+        self.n += other.n
+        self._compress()
+        return self
+
+    def quantile(self, q):
+        items = np.concatenate(self.compactors)
+        if len(items) == 0:
+            return np.nan
+        weights = np.concatenate([np.full(len(c), 2.0 ** h) for h, c in enumerate(self.compactors)])
+        order = np.argsort(items, kind="stable")
+        items, cumulative = items[order], np.cumsum(weights[order])
+        # Same convention as np.quantile's "inverted_cdf" method.
+        idx = np.searchsorted(cumulative, np.asarray(q) * cumulative[-1], side="left")
+        return items[np.minimum(idx, len(items) - 1)]
+
+
+class ModeCounter:
+    def __init__(self):
+        self.counts = {}
+
+    def update(self, values):
+        for value, count in pd.Series(values).dropna().value_counts().items():
+            self.counts[value] = self.counts.get(value, 0) + int(count)
+        return self
+
+    def merge(self, other):
+        for value, count in other.counts.items():
+            self.counts[value] = self.counts.get(value, 0) + count
+        return self
+
+    def mode(self):
+        if not self.counts:
+            return np.nan
+        top = max(self.counts.values())
+        # Ties break on the smallest value, matching DataFrame.mode().iloc[0].
+        return sorted(v for v, c in self.counts.items() if c == top)[0]
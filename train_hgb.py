@@ -0,0 +1,159 @@
+# train_hgb.py - Out-of-core retraining with histogram gradient boosting
+#
+# The CSV is read twice in chunks and never held in memory:
+#   pass 1  partial_fit the imputer and clipper, sketch (KLL) every numeric
+#           feature after feature engineering and count categorical levels;
+#           the sketches give at most 253 cut points per numeric.
+#   pass 2  bin each row once into uint8 codes and keep a uniform reservoir
+#           sample of at most --max-rows of them (14 bytes per row).
+# HistGradientBoostingClassifier is then fitted on the codes. The fit is the
+# memory peak, not the sample: it needs a float32 copy (NaN marks missing),
+# and sklearn makes its own float64 copy, bin codes and per-row gradients on
+# top, about FIT_BYTES_PER_ROW (~360 bytes) per kept row, so size --max-rows
+# for ~375 bytes a row (5M rows: ~1.8 GB). The artifact has
+# the same 12 inputs and step names as NetflixChurn_pipeline.pkl, so it drops
+# into predict_churn / score_batch.py / scoring_service.py unchanged.
+#
+#   python train_hgb.py                                        # netflix_churn.csv -> NetflixChurn_pipeline_hgb.pkl
+#   python train_hgb.py history.csv --chunksize 500000 --max-rows 5000000
+#   python train_hgb.py history.csv --out NetflixChurn_pipeline.pkl   # hot-swapped by running services
+import argparse
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import HistGradientBoostingClassifier
+from sklearn.pipeline import Pipeline
+
+from churn_pipeline import (
+    CATEGORICAL_COLS, DATA_PATH, NUMERIC_COLS, FeatureBinner, FeatureEngineer,
+    MissingValueHandler, OutlierClipper, feature_frame,
+)
+from sketches import KLLSketch
+
+try:
+    import resource
+except ImportError:  # Windows: no peak-RSS report
+    resource = None
+
+HGB_PATH = "NetflixChurn_pipeline_hgb.pkl"
+TARGET = "churned"
+CLIP_COLS = ["watch_hours", "avg_watch_time_per_day"]
+BINNED_NUMERIC = NUMERIC_COLS + ["inactive_flag", "engagement_ratio"]
+MAX_BINS = 255
+MISSING_CODE = 255  # uint8 slot for NaN (missing numeric / unseen level)
+# Transient bytes per sample row during train(), measured with tracemalloc on sklearn 1.9.
+FIT_BYTES_PER_ROW = 360
+
+
+def _chunks(path, chunksize):
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        yield feature_frame(chunk), chunk[TARGET].to_numpy()
+
+
+# ----------------- Pass 1: Statistics -----------------
+def fit_statistics(path, chunksize, sketch_k=1000):
+    """Imputer, clipper and binner fitted from one streaming pass."""
+    missing = MissingValueHandler(NUMERIC_COLS, CATEGORICAL_COLS)
+    outliers = OutlierClipper(CLIP_COLS)
+    features = FeatureEngineer()
+    sketches = {col: KLLSketch(k=sketch_k) for col in BINNED_NUMERIC}
+    rows = 0
+    for X, _ in _chunks(path, chunksize):
+        missing.partial_fit(X)
+        # Clip bounds come from the raw values; the in-memory fit sees them after imputation.
+        outliers.partial_fit(X)
+        # Engineered features are sketched with the running estimates, close enough for bin edges.
+        Z = features.transform(outliers.transform(missing.transform(X)))
+        for col in BINNED_NUMERIC:
+            sketches[col].update(Z[col])
+        rows += len(X)
+
+    binner = FeatureBinner(BINNED_NUMERIC, CATEGORICAL_COLS, MAX_BINS)
+    qs = np.linspace(0, 1, MAX_BINS)[1:-1]
+    binner.cuts_ = {col: np.unique(sketch.quantile(qs)) for col, sketch in sketches.items()}
+    binner.levels_ = {col: sorted(missing.cat_counters_[col].counts) for col in CATEGORICAL_COLS}
+    for col, levels in binner.levels_.items():
+        if len(levels) >= MAX_BINS:
+            raise ValueError(f"{col} has {len(levels)} levels; at most {MAX_BINS - 1} fit in a histogram bin")
+    return Pipeline([("missing", missing), ("outliers", outliers), ("features", features), ("preprocessor", binner)]), rows
+
+
+# ----------------- Pass 2: Binned Sample -----------------
+def sample_binned(path, preprocess, chunksize, max_rows, seed=42):
+    """uint8 codes and labels of a uniform sample (reservoir, algorithm R) of at most max_rows rows."""
+    rng = np.random.default_rng(seed)
+    width = len(preprocess[-1].get_feature_names_out())
+    codes = np.empty((max_rows, width), dtype=np.uint8)  # pages are only touched as rows arrive
+    labels = np.empty(max_rows, dtype=np.uint8)
+    seen = 0
+    for X, y in _chunks(path, chunksize):
+        binned = preprocess.transform(X)
+        binned = np.where(np.isnan(binned), MISSING_CODE, binned).astype(np.uint8)
+        take = max(0, min(len(X), max_rows - seen))
+        codes[seen:seen + take], labels[seen:seen + take] = binned[:take], y[:take]
+        # Once full, row number i replaces a random slot j <= i whenever j < max_rows.
+        slot = rng.integers(0, seen + np.arange(take, len(X)) + 1)
+        keep = slot < max_rows
+        codes[slot[keep]], labels[slot[keep]] = binned[take:][keep], y[take:][keep]
+        seen += len(X)
+    n = min(seen, max_rows)
+    return codes[:n], labels[:n], seen
+
+
+# ----------------- Training -----------------
+def train(codes, labels, preprocess, max_iter=200, learning_rate=0.1, max_leaf_nodes=31, seed=42):
+    X = codes.astype(np.float32)
+    X[codes == MISSING_CODE] = np.nan
+    names = preprocess[-1].get_feature_names_out()
+    model = HistGradientBoostingClassifier(
+        max_iter=max_iter, learning_rate=learning_rate, max_leaf_nodes=max_leaf_nodes,
+        max_bins=MAX_BINS, categorical_features=[name in CATEGORICAL_COLS for name in names],
+        random_state=seed,
+    )
+    model.fit(X, labels)
+    return Pipeline(preprocess.steps + [("model", model)])
+
+
+def peak_rss_mb():
+    if resource is None:
+        return float("nan")
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# ----------------- CLI -----------------
+def main():
+    parser = argparse.ArgumentParser(description="Train a histogram gradient boosting pipeline out of core.")
+    parser.add_argument("data", nargs="?", default=DATA_PATH, help=f"CSV with the 12 inputs and '{TARGET}'")
+    parser.add_argument("--out", default=HGB_PATH)
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--max-rows", type=int, default=5_000_000,
+                        help=f"rows kept for fitting (14 bytes each, ~{FIT_BYTES_PER_ROW} more during the fit)")
+    parser.add_argument("--max-iter", type=int, default=200)
+    parser.add_argument("--learning-rate", type=float, default=0.1)
+    parser.add_argument("--max-leaf-nodes", type=int, default=31)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    preprocess, rows = fit_statistics(args.data, args.chunksize)
+    print(f"pass 1: {rows} rows, {sum(len(c) for c in preprocess[-1].cuts_.values())} numeric cut points "
+          f"({time.perf_counter() - start:.1f}s)")
+    codes, labels, seen = sample_binned(args.data, preprocess, args.chunksize, args.max_rows, args.seed)
+    print(f"pass 2: kept {len(codes)} of {seen} rows, {codes.nbytes / 2**20:.1f} MB of bin codes, "
+          f"~{len(codes) * FIT_BYTES_PER_ROW / 2**20:.0f} MB more to fit ({time.perf_counter() - start:.1f}s)")
+    pipeline = train(codes, labels, preprocess, args.max_iter, args.learning_rate, args.max_leaf_nodes, args.seed)
+    model = pipeline.named_steps["model"]
+    print(f"fit: {model.n_iter_} boosting iterations ({time.perf_counter() - start:.1f}s)")
+
+    # Write-then-rename so a ModelRegistry watching --out never loads a half-written file.
+    tmp = f"{args.out}.tmp"
+    joblib.dump(pipeline, tmp)
+    os.replace(tmp, args.out)
+    print(f"Wrote {args.out}; peak RSS {peak_rss_mb():.0f} MB")
+
+
+if __name__ == "__main__":
+    main()